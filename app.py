@@ -2,8 +2,10 @@
 
 # Standard library imports
 from dotenv import load_dotenv # Used to load environment variables from a .env file.
+import importlib # Imports the crew module in the background when warm-up is enabled.
 import os # Provides functions for interacting with the operating system.
-import re # Regular expression operations, used for parsing text.
+import threading # Runs the optional crew warm-up off the startup path.
+import uuid # Generates the per-user session id that owns background jobs.
 
 # Determine the project root directory and the path to the .env file.
 project_root = os.path.abspath(os.path.dirname(__file__))
@@ -16,24 +18,121 @@ if os.path.exists(dotenv_path):
 else:
     print("⚠️ .env file not found. Please ensure it exists in the project root.")
 
+# The LLM clients are only created when the first stage runs, so warn about a missing key now.
+if not (os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")) and os.getenv("LLM_BACKEND", "").lower() != "stub":
+    print("⚠️ GOOGLE_API_KEY or GEMINI_API_KEY is not set; every stage will fail until it is.")
+
 # Third-party library imports
-from flask import Flask, render_template, request, jsonify, session # Flask framework components for web application.
-import time # Provides time-related functions (though not directly used in the provided snippets).
-import json # For working with JSON data.
+from flask import Flask, Response, render_template, request, jsonify, session, url_for # Flask framework components for web application.
 
 # Local application imports
-from src.crew import ProjectPartnerCrew # Imports the main crew management class.
-from src.tools.composio_tools import composio_instance, MY_APP_USER_ID # Imports Composio tools for external integrations (e.g., Notion).
-
-# Define a constant for the checkpoint file, used to save/resume task progress.
-CHECKPOINT_FILE = "task_progress.json"
+from src.cache import RESULT_CACHE # The crew result cache, for the stats endpoint.
+from src.cache import data_path # Default location of the job store.
+from src.jobs import JobManager, JobStore, QueueFullError, event_stream # Runs pipeline stages on a bounded background worker pool.
+from src.rate_limiter import RATE_LIMITER # Shared per-model LLM rate limiter.
+from src.checkpoints import CHECKPOINTS # Per-session Stage 2 progress.
+from src.observability import METRICS, TRACER # Prometheus metrics and recent traces.
+from src.outbox import NOTION_OUTBOX # Background Notion publishing queue.
+from src.price_index import PRICE_INDEX # Local price index, for its hit counters.
+from src.session_store import SESSION_INTERFACE # Server-side session storage; only an id goes in the cookie.
+from src.stages import STAGE_LABELS, run_planning_stage, run_bom_stage, run_final_assets_stage # The three pipeline stages.
+from src.tools.composio_tools import TOOL_RESULT_CACHE, tool_call_stats # Memoization counters for the search tool.
 
 # --- Flask Application Setup ---
 
 # Initialize the Flask application.
 app = Flask(__name__)
-# Configure a secret key for session management, essential for security.
-app.config['SECRET_KEY'] = os.urandom(24)
+# Session data lives server-side (see src/session_store.py), so it is shared by every worker
+# using the same SESSION_BACKEND and survives restarts; the cookie only carries a random id.
+app.session_interface = SESSION_INTERFACE
+# Secret key for anything else Flask signs. Set SECRET_KEY so it is the same in every worker.
+app.config['SECRET_KEY'] = os.getenv("SECRET_KEY") or os.urandom(24)
+
+# Seconds between SSE keep-alive comments, so proxies do not close quiet streams.
+SSE_KEEPALIVE_SECONDS = 15
+
+# Process-wide job manager; each stage endpoint enqueues work here and returns immediately.
+# Jobs are written through to JOB_DB, so with several worker processes any of them can
+# answer a job's status, result and event requests.
+JOBS = JobManager(
+    max_workers=int(os.getenv("STAGE_WORKERS", "4")),
+    max_queue=int(os.getenv("STAGE_QUEUE_SIZE", "64")),
+    store=JobStore(os.getenv("JOB_DB", data_path("jobs.sqlite3"))),
+)
+
+# Resume publishing any Notion pages left in the outbox by a previous run.
+NOTION_OUTBOX.start()
+
+# CrewAI and the LLM clients load on the first stage that runs. Set CREW_WARMUP=1 to load
+# them on a background thread right after startup instead, so the first user does not wait.
+if os.getenv("CREW_WARMUP", "").lower() in ("1", "true"):
+    threading.Thread(target=importlib.import_module, args=("src.crew",), name="crew-warmup", daemon=True).start()
+
+# --- Metrics ---
+
+def collect_metrics():
+    """
+    Turns the existing stats counters (caches, rate limiter, jobs, Notion outbox) into
+    Prometheus metric families on every /metrics scrape.
+    """
+    cache_samples = {'hits': [], 'misses': [], 'evictions': []}
+    tiers = [({'cache': 'crew_results', 'tier': tier}, stats) for tier, stats in RESULT_CACHE.stats().items()]
+    tiers += [({'cache': 'tool_results', 'tier': 'memory'}, TOOL_RESULT_CACHE.stats), ({'cache': 'price_index', 'tier': 'disk'}, PRICE_INDEX.stats)]
+    for labels, stats in tiers:
+        for field, samples in cache_samples.items():
+            if field in stats:
+                samples.append((labels, stats[field]))
+    tool_calls = tool_call_stats()
+
+    limiter = RATE_LIMITER.stats()
+    limiter_counters = {field: [({'model': model}, bucket[field]) for model, bucket in limiter.items()] for field in ('granted', 'throttled', 'retries', 'wait_seconds')}
+    waiting = [({'model': model, 'lane': lane}, count) for model, bucket in limiter.items() for lane, count in bucket['waiting'].items()]
+
+    jobs = JOBS.stats()
+    return [
+        ('cache_hits_total', 'counter', "Cache hits by cache and tier.", cache_samples['hits']),
+        ('cache_misses_total', 'counter', "Cache misses by cache and tier.", cache_samples['misses']),
+        ('cache_evictions_total', 'counter', "Cache evictions by cache and tier.", cache_samples['evictions']),
+        ('tool_calls_total', 'counter', "Search tool calls by how they were served.", [({'source': 'composio'}, tool_calls['executed']), ({'source': 'cache'}, tool_calls['cache_hits']), ({'source': 'coalesced'}, tool_calls['coalesced'])]),
+        ('rate_limit_granted_total', 'counter', "LLM requests let through by the rate limiter.", limiter_counters['granted']),
+        ('rate_limit_throttled_total', 'counter', "429 responses seen per model.", limiter_counters['throttled']),
+        ('rate_limit_retries_total', 'counter', "LLM calls retried after a rate limit.", limiter_counters['retries']),
+        ('rate_limit_wait_seconds_total', 'counter', "Time callers spent waiting for the rate limiter.", limiter_counters['wait_seconds']),
+        ('rate_limit_requests_per_minute', 'gauge', "Current allowed request rate per model.", [({'model': model}, bucket['requests_per_minute']) for model, bucket in limiter.items()]),
+        ('rate_limit_waiting', 'gauge', "Callers waiting for the rate limiter, by lane.", waiting),
+        ('jobs_queue_depth', 'gauge', "Stage jobs waiting for a worker.", [({}, jobs['queue_depth'])]),
+        ('jobs_running', 'gauge', "Stage jobs currently running.", [({}, jobs['running'])]),
+        ('jobs_total', 'counter', "Stage jobs by outcome.", [({'outcome': outcome}, jobs[outcome]) for outcome in ('submitted', 'succeeded', 'failed', 'rejected')]),
+        ('notion_outbox_entries', 'gauge', "Notion outbox entries by status.", [({'status': status}, count) for status, count in NOTION_OUTBOX.stats().items()]),
+    ]
+
+METRICS.register_collector(collect_metrics)
+
+# --- Job Helpers ---
+
+def session_id():
+    """
+    Returns the id identifying this browser session, creating one if needed.
+    Jobs are tied to it so only the submitting user can collect their results.
+    """
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+def enqueue_stage(kind, fn, *args):
+    """
+    Queues a pipeline stage and responds with 202 and the URLs to follow it.
+    """
+    try:
+        job = JOBS.submit(kind, session_id(), fn, *args)
+    except QueueFullError as e:
+        return jsonify({"error": "Server busy", "details": str(e)}), 503
+    return jsonify(dict(
+        job.to_dict(),
+        status_url=url_for('job_status_endpoint', job_id=job.id),
+        result_url=url_for('job_result_endpoint', job_id=job.id),
+        events_url=url_for('job_events_endpoint', job_id=job.id),
+    )), 202
 
 # --- Routes ---
 
@@ -49,38 +148,19 @@ def index():
 def kickoff_crew_endpoint():
     """
     API endpoint to initiate the project planning stage.
-    It receives project details from the frontend, kicks off the planning crew,
-    and stores the plan in the session.
+    It receives project details from the frontend and queues the planning crew;
+    the plan is stored in the session when the job's result is collected.
     """
-    # Remove any existing checkpoint file to start a fresh process.
-    if os.path.exists(CHECKPOINT_FILE):
-        os.remove(CHECKPOINT_FILE)
-
     # Get project details from the incoming JSON request.
     data = request.get_json()
     project_details = data.get('project_details')
     # Validate if project details are provided.
     if not project_details: return jsonify({"error": "Project details are required."}), 400
 
-    print(f"🚀 Stage 1: Planning for -> {project_details}")
-    try:
-        # Initialize the crew manager and run the planning crew.
-        crew_manager = ProjectPartnerCrew()
-        result = crew_manager.planning_crew().kickoff(inputs={'project_details': project_details})
-
-        # Store the project plan and details in the Flask session.
-        session['project_plan'] = result.raw
-        session['project_details'] = project_details
-
-        print(f"✅ Stage 1 Finished.")
-        # Return the planning result and a prompt for the next stage.
-        return jsonify({
-            "result": result.raw,
-            "prompt": "Enter 'Proceed' to generate the Bill of Materials."
-        })
-    except Exception as e:
-        # Handle any errors during Stage 1.
-        return jsonify({"error": "Error in Stage 1", "details": str(e)}), 500
+    # Clear only this session's checkpoint to start a fresh process; other users' progress is untouched.
+    CHECKPOINTS.clear(session_id())
+
+    return enqueue_stage('planning', run_planning_stage, project_details)
 
 @app.route('/generate_bom', methods=['POST'])
 def generate_bom_endpoint():
@@ -89,89 +169,10 @@ def generate_bom_endpoint():
     This stage involves naming the project, designing a conceptual BOM,
     and sourcing final parts, potentially interacting with external tools like Notion.
     """
-    # Retrieve necessary data from the session.
-    project_plan = session.get('project_plan')
-    project_details = session.get('project_details')
     # Validate if session data is present.
-    if not project_plan or not project_details: return jsonify({"error": "Session data missing."}), 400
+    if not session.get('project_plan') or not session.get('project_details'): return jsonify({"error": "Session data missing."}), 400
 
-    print(f"🚀 Stage 2: Generating BOM content for -> {project_details}")
-    try:
-        crew_manager = ProjectPartnerCrew()
-
-        # Check for a checkpoint file to resume progress if available.
-        # This condition checks if the checkpoint file does NOT exist, indicating a fresh start or a point before a checkpoint was saved.
-        if not os.path.exists(CHECKPOINT_FILE):
-            print("🧠 Generating project name...")
-            name_result = crew_manager.naming_crew().kickoff(inputs={'project_details': project_details})
-            session['project_name'] = name_result.raw
-
-            print("🧠 Designing conceptual BOM...")
-            design_result = crew_manager.design_crew().kickoff(inputs={'project_plan': project_plan})
-            session['conceptual_bom_table'] = design_result.raw
-        else:
-            print("Resuming from a saved checkpoint...")
-
-        print("🧠 Sourcing final parts...")
-
-        # Kick off the sourcing crew with the conceptual BOM.
-        sourcing_inputs = {'final_bom': session['conceptual_bom_table']}
-        sourcing_result = crew_manager.sourcing_crew().kickoff(inputs=sourcing_inputs)
-
-        # Handle rate limit hits from external APIs.
-        if "RATE_LIMIT_HIT" in sourcing_result.raw:
-            print("🚨 Rate limit hit. Process paused. Progress has been saved by the agent.")
-            return jsonify({
-                "result": "I'm working on your component list, but I've hit a temporary API limit. Your progress is saved!",
-                "prompt": "Please wait 60 seconds and then enter 'Proceed' again to continue from where I left off."
-            })
-
-        # Remove checkpoint file after successful sourcing.
-        if os.path.exists(CHECKPOINT_FILE):
-            os.remove(CHECKPOINT_FILE)
-
-        full_bom_output = sourcing_result.raw
-
-        # Ensure the output from the sourcing crew is in the expected format.
-        if '---DATA_SEPARATOR---' not in full_bom_output:
-            raise Exception(f"Sourcing crew failed to generate the correct output format. It returned: '{full_bom_output}'")
-
-        # Split the output into user summary and final BOM table.
-        user_summary, final_bom_table = full_bom_output.split('---DATA_SEPARATOR---')
-
-        print("🤖 Python is now creating and populating the Notion pages...")
-        project_name = session['project_name']
-
-        # Create a main project page in Notion.
-        project_page_result = composio_instance.tools.execute(user_id=MY_APP_USER_ID, slug="NOTION_CREATE_NOTION_PAGE", arguments={"parent_id": os.getenv("NOTION_PARENT_PAGE_ID"), "title": project_name})
-        if not project_page_result.get("successful"): raise Exception(f"Failed to create main project page: {project_page_result.get('error')}")
-
-        # Store Notion page details in the session.
-        project_page_id = project_page_result['data']['id']
-        project_page_url = project_page_result['data']['url']
-        session['project_page_id'] = project_page_id
-        session['project_page_url'] = project_page_url
-
-        # Create a "Conceptual BOM" page under the main project page and populate it.
-        conceptual_page_result = composio_instance.tools.execute(user_id=MY_APP_USER_ID, slug="NOTION_CREATE_NOTION_PAGE", arguments={"parent_id": project_page_id, "title": "Conceptual BOM"})
-        if not conceptual_page_result.get("successful"): raise Exception(f"Failed to create Conceptual BOM page: {conceptual_page_result.get('error')}")
-        composio_instance.tools.execute(user_id=MY_APP_USER_ID, slug="NOTION_ADD_MULTIPLE_PAGE_CONTENT", arguments={"parent_block_id": conceptual_page_result['data']['id'], "content_blocks": [{"content_block": {"content": session['conceptual_bom_table']}}]})
-
-        # Create a "Final Bill of Materials (BOM)" page and populate it.
-        final_bom_page_result = composio_instance.tools.execute(user_id=MY_APP_USER_ID, slug="NOTION_CREATE_NOTION_PAGE", arguments={"parent_id": project_page_id, "title": "Final Bill of Materials (BOM)"})
-        if not final_bom_page_result.get("successful"): raise Exception(f"Failed to create Final BOM page: {final_bom_page_result.get('error')}")
-        composio_instance.tools.execute(user_id=MY_APP_USER_ID, slug="NOTION_ADD_MULTIPLE_PAGE_CONTENT", arguments={"parent_block_id": final_bom_page_result['data']['id'], "content_blocks": [{"content_block": {"content": final_bom_table}}]})
-
-        print("✅ Notion pages created and populated successfully.")
-
-        # Store final BOM data and prepare the output for the user.
-        session['final_bom_data'] = final_bom_table.strip()
-        final_output_for_user = user_summary.strip() + f"\n\n[View your full project folder on Notion]({project_page_url})"
-        return jsonify({"result": final_output_for_user, "prompt": "Enter 'Proceed' to generate the final assets (code and diagram)."})
-
-    except Exception as e:
-        print(f"❌ Error during Stage 2: {e}")
-        return jsonify({"error": "Error in Stage 2", "details": str(e)}), 500
+    return enqueue_stage('bom', run_bom_stage, dict(session))
 
 @app.route('/generate_final_assets', methods=['POST'])
 def generate_final_assets_endpoint():
@@ -179,101 +180,111 @@ def generate_final_assets_endpoint():
     API endpoint to generate final project assets, including diagrams and code.
     These assets are then uploaded to Notion.
     """
-    # Retrieve necessary data from the session.
-    final_bom_data = session.get('final_bom_data')
-    project_page_id = session.get('project_page_id') # This is the ID of the main project FOLDER in Notion.
-    project_plan = session.get('project_plan')
     # Validate if session data is present.
-    if not all([final_bom_data, project_page_id, project_plan]):
+    if not all([session.get('final_bom_data'), session.get('notion_entry'), session.get('project_plan')]):
         return jsonify({"error": "Session data missing."}), 400
 
-    print(f"🚀 Stage 3: Generating final assets...")
-    try:
-        crew_manager = ProjectPartnerCrew()
-
-        print("🧠 Generating all diagrams...")
-        # Kick off the diagram generation crew.
-        diagram_inputs = {'final_bom': final_bom_data, 'project_plan': project_plan}
-        diagram_result = crew_manager.diagram_generation_crew().kickoff(inputs=diagram_inputs)
-        diagram_json_output = diagram_result.raw
-
-        print("🧠 Generating Arduino code...")
-        # Kick off the code generation crew.
-        code_inputs = {'final_bom': final_bom_data}
-        code_result = crew_manager.code_generation_crew().kickoff(inputs=code_inputs)
-        code_sketch = code_result.raw
-
-        print("🤖 Python is now parsing and creating the final guide page...")
-
-        def extract_json_block(text: str) -> dict:
-            """
-            Helper function to extract a JSON block from a given text.
-            It looks for content enclosed in ```json ... ```.
-            """
-            match = re.search(r"```json\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
-            if not match:
-                try: return json.loads(text) # Try to load as JSON directly if no code block found.
-                except json.JSONDecodeError: raise ValueError("Could not find a valid JSON block in diagram output.")
-            return json.loads(match.group(1))
-
-        def clean_code_block(text: str, language: str) -> str:
-            """
-            Helper function to extract and clean a code block from a given text.
-            It looks for content enclosed in ```<language> ... ```.
-            """
-            match = re.search(rf"```{language}\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
-            return match.group(1).strip() if match else text.strip()
-
-        # Extract diagram data from the crew's output.
-        diagram_data = extract_json_block(diagram_json_output)
-        workflow_mermaid = diagram_data.get("workflow_mermaid", "Error: Workflow diagram not found.")
-        architecture_mermaid = diagram_data.get("architecture_mermaid", "Error: Architecture diagram not found.")
-
-        # Create a "Full Project Guide" page in Notion.
-        guide_page_result = composio_instance.tools.execute(
-            user_id=MY_APP_USER_ID,
-            slug="NOTION_CREATE_NOTION_PAGE",
-            arguments={"parent_id": project_page_id, "title": "Full Project Guide"}
-        )
-        if not guide_page_result.get("successful"):
-            raise Exception(f"Failed to create the final guide page: {guide_page_result.get('error')}")
-
-        guide_page_id = guide_page_result['data']['id']
-
-        # Prepare content blocks for the Notion page, including diagrams and code.
-        final_content_blocks = [
-            {"content_block": {"content": "## Workflow Diagram"}},
-            # Wrap the mermaid diagram source in a Markdown code block
-            {"content_block": {"content": f"```mermaid\n{workflow_mermaid}\n```"}},
-            
-            {"content_block": {"content": "## Architecture Diagram"}},
-            # Wrap the architecture diagram source in a Markdown code block
-            {"content_block": {"content": f"```mermaid\n{architecture_mermaid}\n```"}},
-
-            {"content_block": {"content": "## Arduino Code"}},
-            # Wrap the Arduino code in a Markdown code block, specifying the language
-            {"content_block": {"content": f"```cpp\n{clean_code_block(code_sketch, 'cpp')}\n```"}}
-        ]
-
-        # Append the generated content to the Notion guide page.
-        append_result = composio_instance.tools.execute(
-            user_id=MY_APP_USER_ID,
-            slug="NOTION_ADD_MULTIPLE_PAGE_CONTENT",
-            arguments={"parent_block_id": guide_page_id, "content_blocks": final_content_blocks}
-        )
-        if not append_result.get("successful"):
-            raise Exception(f"Failed to append final assets to the guide page: {append_result.get('error')}")
-
-        print("✅ Final guide page created and populated successfully.")
-
-        # Clear session data and provide the final Notion project URL.
-        project_page_url = session.get('project_page_url', '#')
+    return enqueue_stage('final_assets', run_final_assets_stage, dict(session))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    """
+    Reports a job's status and timings, plus the current queue depth.
+    """
+    job = JOBS.get(job_id)
+    if job is None or job.owner != session.get('sid'): return jsonify({"error": "Job not found."}), 404
+    return jsonify(dict(job.to_dict(), queue_depth=JOBS.stats()['queue_depth']))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result_endpoint(job_id):
+    """
+    Returns a finished job's output and applies its session updates.
+    Responds with 202 while the job is still queued or running.
+    """
+    job = JOBS.get(job_id)
+    if job is None or job.owner != session.get('sid'): return jsonify({"error": "Job not found."}), 404
+    if not job.done: return jsonify(job.to_dict()), 202
+    if job.status == 'failed':
+        return jsonify({"error": f"Error in {STAGE_LABELS[job.kind]}", "details": job.error}), 500
+
+    # Store what the stage produced in the user's session.
+    if job.result['clear_session']:
+        # Keep the id: it still owns this user's jobs and queued Notion pages.
+        sid = session.get('sid')
         session.clear()
+        session['sid'] = sid
+    session.update(job.result['session'])
+    response = dict(job.result['response'])
+    if 'notion_entry' in response:
+        response['notion_status_url'] = url_for('notion_status_endpoint', entry_id=response.pop('notion_entry'))
+    return jsonify(response)
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events_endpoint(job_id):
+    """
+    Streams a job's progress as Server-Sent Events: status changes, stage progress lines,
+    per-component sourcing results, and LLM output tokens as they are produced.
+    Reconnecting clients resume after the `Last-Event-ID` they last received.
+    """
+    job = JOBS.get(job_id)
+    if job is None or job.owner != session.get('sid'): return jsonify({"error": "Job not found."}), 404
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    cursor = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    return Response(event_stream(job, cursor, SSE_KEEPALIVE_SECONDS), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/notion/<entry_id>', methods=['GET'])
+def notion_status_endpoint(entry_id):
+    """
+    Reports whether a queued Notion page has been published yet, and its URL once it has.
+    """
+    entry = NOTION_OUTBOX.status(entry_id)
+    if entry is None or entry.pop('session_id') != session.get('sid'): return jsonify({"error": "Notion page not found."}), 404
+    return jsonify(entry)
+
+@app.route('/notion/stats', methods=['GET'])
+def notion_stats_endpoint():
+    """
+    Counts queued, in-flight, published and failed Notion pages.
+    """
+    return jsonify(NOTION_OUTBOX.stats())
+
+@app.route('/jobs/stats', methods=['GET'])
+def job_stats_endpoint():
+    """
+    Reports queue depth, running jobs, and lifetime job counters.
+    """
+    return jsonify(JOBS.stats())
 
-        return jsonify({"result": f"[View your complete project folder on Notion!]({project_page_url})"})
-    except Exception as e:
-        print(f"❌ Error during Stage 3: {e}")
-        return jsonify({"error": "Error in Stage 3", "details": str(e)}), 500
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats_endpoint():
+    """
+    Reports hit, miss and eviction counters for the crew result cache, and how many
+    search tool calls were saved by memoization and request coalescing.
+    """
+    return jsonify({"crew_results": RESULT_CACHE.stats(), "tool_calls": tool_call_stats()})
+
+@app.route('/rate_limits/stats', methods=['GET'])
+def rate_limit_stats_endpoint():
+    """
+    Reports each model's current request rate, waiting callers per lane, and 429/retry counters.
+    """
+    return jsonify(RATE_LIMITER.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Exposes span latencies, LLM token usage, cache, rate limit, job and outbox metrics
+    in the Prometheus text format.
+    """
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/traces', methods=['GET'])
+def traces_endpoint():
+    """
+    Returns the most recent spans as OTLP/JSON; `?trace_id=` narrows it to one job's trace.
+    """
+    return jsonify(TRACER.export(limit=request.args.get('limit', type=int), trace_id=request.args.get('trace_id')))
 
 # --- Application Entry Point ---
 
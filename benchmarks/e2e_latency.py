@@ -0,0 +1,273 @@
+# benchmarks/e2e_latency.py
+
+"""
+End-to-end latency benchmark for the three pipeline stages.
+
+Runs the real app (Flask routes, job queue, CrewAI agents, output parsing, sourcing
+fan-out, Notion outbox) with the LLM and Composio replaced by local stubs that have
+configurable latency and failure rates (LLM_BACKEND=stub, COMPOSIO_BACKEND=stub). Simulated
+users drive /kickoff_crew -> /generate_bom -> /generate_final_assets concurrently. The report
+covers p50/p95/p99 latency per stage, split into queue wait and run time, plus throughput,
+peak memory, and LLM prompt tokens, time to first token and call latency per crew. Run it from the project root:
+
+    python benchmarks/e2e_latency.py                           # 8 users, 4 at a time
+    python benchmarks/e2e_latency.py --users 32 --concurrency 16 --stage-workers 8
+    python benchmarks/e2e_latency.py --llm-latency-ms 800 --llm-failure-rate 0.05 --json out.json
+    python benchmarks/e2e_latency.py --no-cache --no-compaction   # compare with and without prompt compaction
+"""
+
+# Standard library imports
+import argparse # Parses the command-line options.
+import contextlib # Silences the agents' console output while measuring.
+import io # Sink for the silenced output.
+import json # Writes the optional machine-readable report.
+import math # Nearest-rank percentiles.
+import os # Configures the app through environment variables before it is imported.
+import resource # Peak resident memory of the process.
+import sys # Makes the project importable when run as a script.
+import tempfile # Keeps the SQLite files created by the run out of the project.
+import time # Measures latencies and wall-clock time.
+import tracemalloc # Optional peak Python heap measurement.
+from concurrent.futures import ThreadPoolExecutor # Runs simulated users side by side.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = [
+    ('planning', '/kickoff_crew'),
+    ('bom', '/generate_bom'),
+    ('final_assets', '/generate_final_assets'),
+]
+
+# A paused Stage 2 (rate limit) is resumed at once, up to this many times per user.
+MAX_BOM_ATTEMPTS = 3
+
+def configure_environment(args, workdir):
+    """
+    Points the app at the stubs and at throwaway storage. Must run before `app` is imported,
+    since its settings are read at import time.
+    """
+    os.environ.update({
+        "LLM_BACKEND": "stub",
+        "COMPOSIO_BACKEND": "stub",
+        "STUB_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "STUB_LLM_FAILURE_RATE": str(args.llm_failure_rate),
+        "STUB_LLM_PREFILL_MS_PER_1K": str(args.llm_prefill_ms),
+        "PROMPT_COMPACTION": "0" if args.no_compaction else "1",
+        "STUB_COMPOSIO_LATENCY_MS": str(args.composio_latency_ms),
+        "STUB_COMPOSIO_FAILURE_RATE": str(args.composio_failure_rate),
+        "STUB_SEED": str(args.seed),
+        "STAGE_WORKERS": str(args.stage_workers),
+        "STAGE_QUEUE_SIZE": str(max(64, args.users * len(STAGES))),
+        "SOURCING_WORKERS": str(args.sourcing_workers),
+        "LLM_RPM_BUDGETS": f"gemini/gemini-2.5-flash={args.rpm},gemini/gemini-2.5-pro={args.rpm}",
+        "NOTION_PARENT_PAGE_ID": "stub-parent-page",
+        "CHECKPOINT_DB": os.path.join(workdir, "checkpoints.sqlite3"),
+        "PRICE_INDEX_DB": os.path.join(workdir, "price_index.sqlite3"),
+        "NOTION_OUTBOX_DB": os.path.join(workdir, "notion_outbox.sqlite3"),
+        "JOB_DB": os.path.join(workdir, "jobs.sqlite3"),
+        "COMPOSIO_TOOL_CACHE": os.path.join(workdir, "composio_tools_cache.json"),
+        "SESSION_BACKEND": "memory",
+        "CONFIG_RELOAD_INTERVAL": "0",
+        # No telemetry, and no interactive first-run prompt from CrewAI.
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+        "CREWAI_TESTING": "true",
+    })
+    if args.no_cache:
+        # Every user pays for every LLM call and search, as if all projects were new.
+        os.environ.update({"RESULT_CACHE_SIZE": "0", "TOOL_CACHE_SIZE": "0", "PRICE_INDEX_MAX_AGE_DAYS": "0"})
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of `values` (None if empty).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def run_stage(client, endpoint, body, poll_interval):
+    """
+    Submits one stage and polls until its result is ready.
+    Returns `(latency, job_timings, response_json, status_code)`.
+    """
+    start = time.perf_counter()
+    submitted = client.post(endpoint, json=body)
+    if submitted.status_code != 202:
+        return time.perf_counter() - start, {}, submitted.get_json(), submitted.status_code
+    job = submitted.get_json()
+    while True:
+        status = client.get(job['status_url']).get_json()
+        if status['status'] in ('succeeded', 'failed'):
+            break
+        time.sleep(poll_interval)
+    result = client.get(job['result_url'])
+    return time.perf_counter() - start, status.get('timings', {}), result.get_json(), result.status_code
+
+def run_user(app, index, poll_interval):
+    """
+    Drives one simulated user through all three stages; returns one record per stage.
+    """
+    client = app.test_client()
+    records = []
+    bodies = {'planning': {'project_details': f"Benchmark project #{index}: an automatic plant watering system"}}
+    for stage, endpoint in STAGES:
+        attempts = MAX_BOM_ATTEMPTS if stage == 'bom' else 1
+        latency, timings, total_queued, total_run = 0.0, {}, 0.0, 0.0
+        for attempt in range(1, attempts + 1):
+            elapsed, timings, response, status_code = run_stage(client, endpoint, bodies.get(stage, {}), poll_interval)
+            latency += elapsed
+            total_queued += timings.get('queued_seconds', 0.0)
+            total_run += timings.get('run_seconds', 0.0)
+            # Stage 2 pauses on a rate limit without a Notion entry; "Proceed" resumes it.
+            if stage != 'bom' or status_code != 200 or 'notion_status_url' in response:
+                break
+        ok = status_code == 200 and not (stage == 'bom' and 'notion_status_url' not in response)
+        records.append({'user': index, 'stage': stage, 'ok': ok, 'status': status_code, 'attempts': attempt,
+                        'latency': latency, 'queued': total_queued, 'run': total_run,
+                        'error': None if ok else (response or {}).get('details') or (response or {}).get('error') or (response or {}).get('result')})
+        if not ok:
+            break
+    return records
+
+def summarize(records, wall, users):
+    """
+    Aggregates per-stage latency percentiles, failures and throughput.
+    """
+    report = {'stages': {}, 'wall_seconds': wall}
+    for stage, _ in STAGES + [('flow', None)]:
+        if stage == 'flow':
+            by_user = {}
+            for record in records:
+                by_user.setdefault(record['user'], []).append(record)
+            completed = [rs for rs in by_user.values() if len(rs) == len(STAGES) and all(r['ok'] for r in rs)]
+            latencies = [sum(r['latency'] for r in rs) for rs in completed]
+            report['stages']['flow'] = {'count': len(completed), 'failed': users - len(completed),
+                                        **{f"p{p}": percentile(latencies, p) for p in (50, 95, 99)}}
+            report['throughput_flows_per_minute'] = len(completed) / wall * 60 if wall else None
+            continue
+        stage_records = [r for r in records if r['stage'] == stage]
+        ok = [r for r in stage_records if r['ok']]
+        entry = {'count': len(ok), 'failed': len(stage_records) - len(ok), 'retried': sum(r['attempts'] > 1 for r in stage_records)}
+        for field in ('latency', 'queued', 'run'):
+            values = [r[field] for r in ok]
+            entry.update({f"{field}_p{p}" if field != 'latency' else f"p{p}": percentile(values, p) for p in (50, 95, 99)})
+        report['stages'][stage] = entry
+    return report
+
+def llm_usage():
+    """
+    Reads prompt tokens, LLM calls, mean time to first token and mean call time per crew stage
+    from the app's metrics, plus the raw and sent size of the earlier-stage outputs filled into
+    each stage's prompts.
+    """
+    from src.observability import METRICS # Imported after the app, like the rest of `src`.
+    usage = {}
+    def entry(stage):
+        return usage.setdefault(stage, {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'call_seconds': 0.0,
+                                        'first_token_seconds': 0.0, 'streamed_calls': 0, 'inputs_raw': 0, 'inputs_sent': 0})
+    for metric_name in ('llm_tokens_total', 'llm_call_seconds', 'llm_time_to_first_token_seconds', 'prompt_input_tokens_total'):
+        metric = METRICS.get(metric_name)
+        for name, labels, value in (metric.samples() if metric else []):
+            if name.endswith('llm_tokens_total'):
+                entry(labels['stage'])[f"{labels['type']}_tokens"] += value
+            elif name.endswith('llm_call_seconds_sum'):
+                entry(labels['stage'])['call_seconds'] += value
+            elif name.endswith('llm_time_to_first_token_seconds_sum'):
+                entry(labels['stage'])['first_token_seconds'] += value
+            elif name.endswith('llm_time_to_first_token_seconds_count'):
+                entry(labels['stage'])['streamed_calls'] += value
+            elif name.endswith('llm_call_seconds_count'):
+                entry(labels['stage'])['calls'] += value
+            elif name.endswith('prompt_input_tokens_total'):
+                entry(labels['stage'])[f"inputs_{labels['form']}"] += value
+    for stats in usage.values():
+        calls = stats['calls']
+        stats['mean_prompt_tokens'] = stats['prompt_tokens'] / calls if calls else None
+        stats['mean_call_seconds'] = stats['call_seconds'] / calls if calls else None
+        stats['mean_first_token_seconds'] = stats['first_token_seconds'] / stats['streamed_calls'] if stats['streamed_calls'] else None
+    return usage
+
+def print_report(report, args):
+    def ms(value):
+        return f"{value * 1000:>9.0f}" if value is not None else f"{'-':>9}"
+    print(f"\n=== {args.users} users, {args.concurrency} at a time; stage workers={args.stage_workers}, "
+          f"sourcing workers={args.sourcing_workers}; LLM {args.llm_latency_ms} ms ({args.llm_failure_rate:.0%} 429s), "
+          f"Composio {args.composio_latency_ms} ms ({args.composio_failure_rate:.0%} failures){'; caches off' if args.no_cache else ''}"
+          f"{'; compaction off' if args.no_compaction else ''} ===")
+    print(f"{'stage':<14}{'ok':>5}{'failed':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queue p95':>10}{'run p95':>9}")
+    for stage, entry in report['stages'].items():
+        print(f"{stage:<14}{entry['count']:>5}{entry['failed']:>7}{ms(entry['p50'])}{ms(entry['p95'])}{ms(entry['p99'])}"
+              f"{ms(entry.get('queued_p95')):>10}{ms(entry.get('run_p95'))}")
+    print(f"\n{'crew stage':<14}{'calls':>7}{'prompt tok':>12}{'tok/call':>10}{'TTFT ms':>9}{'call ms':>9}{'inputs raw':>12}{'sent':>8}")
+    for stage, stats in sorted(report['llm'].items()):
+        per_call = f"{stats['mean_prompt_tokens']:>10.0f}" if stats['mean_prompt_tokens'] is not None else f"{'-':>10}"
+        print(f"{stage:<14}{stats['calls']:>7.0f}{stats['prompt_tokens']:>12.0f}{per_call}{ms(stats['mean_first_token_seconds'])}{ms(stats['mean_call_seconds'])}"
+              f"{stats['inputs_raw']:>12.0f}{stats['inputs_sent']:>8.0f}")
+    print(f"\nwall time: {report['wall_seconds']:.1f}s, throughput: {report['throughput_flows_per_minute']:.1f} flows/min")
+    print(f"peak RSS: {report['peak_rss_mb']:.0f} MB" + (f", peak Python heap: {report['peak_heap_mb']:.0f} MB" if 'peak_heap_mb' in report else ""))
+    for error in report['errors'][:5]:
+        print(f"error: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8, help="simulated users, each running all three stages")
+    parser.add_argument("--concurrency", type=int, default=4, help="users active at the same time")
+    parser.add_argument("--stage-workers", type=int, default=4, help="STAGE_WORKERS for the job queue")
+    parser.add_argument("--sourcing-workers", type=int, default=4, help="SOURCING_WORKERS for the Stage 2 fan-out")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="mean latency of each stub LLM call")
+    parser.add_argument("--llm-prefill-ms", type=float, default=20, help="extra stub LLM latency per 1,000 prompt tokens")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="share of LLM calls failing with a 429")
+    parser.add_argument("--composio-latency-ms", type=float, default=150, help="latency of each stub Composio call")
+    parser.add_argument("--composio-failure-rate", type=float, default=0.0, help="share of Composio calls that fail")
+    parser.add_argument("--rpm", type=float, default=100000, help="LLM requests-per-minute budget per model")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the stubs' jitter and failures")
+    parser.add_argument("--no-cache", action="store_true", help="disable the result, tool and price caches")
+    parser.add_argument("--no-compaction", action="store_true", help="pass earlier stage outputs to prompts verbatim")
+    parser.add_argument("--poll-ms", type=float, default=20, help="how often users poll their job status")
+    parser.add_argument("--trace-memory", action="store_true", help="also report peak Python heap (slower)")
+    parser.add_argument("--verbose", action="store_true", help="show the app's and agents' console output")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+    if args.users < 1 or args.concurrency < 1:
+        parser.error("--users and --concurrency must be at least 1")
+
+    # The app's background threads may still be touching the databases when the run ends; a
+    # leftover file must not stop the report from being printed.
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as workdir:
+        configure_environment(args, workdir)
+        sys.path.insert(0, PROJECT_ROOT)
+        if args.trace_memory:
+            tracemalloc.start()
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            from app import app # Imported only now, so it picks up the benchmark settings.
+            import src.crew # Loaded before timing starts, like a warmed-up worker (see CREW_WARMUP).
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                flows = list(pool.map(lambda index: run_user(app, index, args.poll_ms / 1000), range(args.users)))
+            wall = time.perf_counter() - start
+            # Let the Notion outbox finish its current page and stop before its database is deleted.
+            from src.outbox import NOTION_OUTBOX
+            NOTION_OUTBOX.stop()
+
+        records = [record for flow in flows for record in flow]
+        report = summarize(records, wall, args.users)
+        report['llm'] = llm_usage()
+        report['errors'] = [f"user {r['user']} {r['stage']}: {r['error']}" for r in records if not r['ok']]
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report['peak_rss_mb'] = peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        if args.trace_memory:
+            report['peak_heap_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        report['settings'] = vars(args)
+
+    print_report(report, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/import_time.py
+
+"""
+Import-time report for the app's startup path.
+
+Runs each target import in a fresh interpreter with `python -X importtime`, then prints the
+wall-clock time, the slowest modules by cumulative import time, and whether the heavy
+libraries (CrewAI, LiteLLM, Composio) were loaded. Run it from the project root:
+
+    python benchmarks/import_time.py            # app startup vs. first stage
+    python benchmarks/import_time.py --top 25 app
+"""
+
+# Standard library imports
+import argparse # Parses the command-line options.
+import os # Builds the isolated environment for each measured import.
+import subprocess # Runs each import in a fresh interpreter.
+import sys # Locates the current Python interpreter.
+import tempfile # Keeps the SQLite files created during startup out of the project.
+import time # Measures wall-clock time per import.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each target measures: the web app's boot, and the extra cost paid by the first stage.
+TARGETS = {
+    'app': "import app",
+    'crew': "import src.crew",
+}
+
+# Libraries that should stay off the startup path.
+HEAVY_MODULES = ['crewai', 'litellm', 'composio']
+
+def measure(statement, workdir):
+    """
+    Runs `statement` under `-X importtime` and returns `(wall_seconds, rows, loaded_modules)`,
+    where rows are `(self_us, cumulative_us, module)` tuples.
+    """
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_ROOT,
+        COMPOSIO_BACKEND="stub", # Never touch the network while measuring.
+        GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "benchmark-key"),
+        CHECKPOINT_DB=os.path.join(workdir, "checkpoints.sqlite3"),
+        PRICE_INDEX_DB=os.path.join(workdir, "price_index.sqlite3"),
+        NOTION_OUTBOX_DB=os.path.join(workdir, "notion_outbox.sqlite3"),
+        SESSION_DB=os.path.join(workdir, "sessions.sqlite3"),
+        JOB_DB=os.path.join(workdir, "jobs.sqlite3"),
+    )
+    probe = f"{statement}; import sys; print(' '.join(sorted(m for m in sys.modules if '.' not in m)))"
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise SystemExit(f"'{statement}' failed:\n{completed.stderr[-2000:]}")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        # Lines look like: "import time:      1234 |      56789 |   package.module"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.strip()))
+    # The probe prints the loaded top-level modules last, after anything the app itself printed.
+    loaded = set(completed.stdout.strip().splitlines()[-1].split())
+    return wall, rows, loaded
+
+def report(name, statement, top, workdir):
+    wall, rows, loaded = measure(statement, workdir)
+    total_ms = sum(self_us for self_us, _, _ in rows) / 1000
+    print(f"\n=== {name}: `{statement}` ===")
+    print(f"wall time (incl. interpreter start): {wall * 1000:.0f} ms, imports: {total_ms:.0f} ms across {len(rows)} modules")
+    print("heavy libraries loaded: " + ", ".join(f"{module}={'yes' if module in loaded else 'no'}" for module in HEAVY_MODULES))
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, module in sorted(rows, key=lambda row: row[1], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {module}")
+    return wall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", help=f"what to measure: {', '.join(TARGETS)} (default: all)")
+    parser.add_argument("--top", type=int, default=15, help="how many of the slowest modules to list")
+    args = parser.parse_args()
+    unknown = [name for name in args.targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        walls = {name: report(name, TARGETS[name], args.top, workdir) for name in (args.targets or TARGETS)}
+    print("\nSummary: " + ", ".join(f"{name}={wall * 1000:.0f} ms" for name, wall in walls.items()))
+
+if __name__ == "__main__":
+    main()
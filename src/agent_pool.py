@@ -0,0 +1,77 @@
+# src/agent_pool.py
+
+# Standard library imports
+import threading # Guards the pool's idle lists across concurrent Flask request threads.
+
+# --- Agent Pool ---
+
+class AgentPool:
+    """
+    A process-wide, thread-safe pool of CrewAI agents.
+
+    Agents are built lazily the first time a request asks for them and are returned
+    to the pool afterwards, so later requests skip agent construction entirely. Each
+    agent is checked out by exactly one request at a time, and its per-run state is
+    wiped on release so nothing from one user's run is visible to the next.
+    """
+    def __init__(self, factory, max_idle_per_agent=8):
+        """
+        `factory` builds a fresh agent from its name. `max_idle_per_agent` caps how many
+        idle copies of each agent are kept around after a burst of concurrent requests.
+        """
+        self._factory = factory
+        self._max_idle = max_idle_per_agent
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {'built': 0, 'reused': 0, 'discarded': 0}
+
+    def acquire(self, name, version=None, **build_kwargs):
+        """
+        Checks out an agent for exclusive use, building one only if none is idle.
+
+        Idle agents are kept per `(name, version)`, so an agent built from one version of its
+        config is never handed to a request using another. `build_kwargs` go to the factory.
+        """
+        with self._lock:
+            idle = self._idle.get((name, version))
+            if idle:
+                self.stats['reused'] += 1
+                return idle.pop()
+            self.stats['built'] += 1
+        # Construction happens outside the lock so other requests are not blocked by it.
+        return self._factory(name, **build_kwargs)
+
+    def release(self, name, agent, version=None):
+        """
+        Resets an agent's per-run state and returns it to the pool.
+        """
+        reset_agent(agent)
+        with self._lock:
+            idle = self._idle.setdefault((name, version), [])
+            if len(idle) < self._max_idle:
+                idle.append(agent)
+            else:
+                self.stats['discarded'] += 1
+
+    def clear(self, keep_versions=None):
+        """
+        Drops idle agents, e.g. after the agent configuration has changed. With
+        `keep_versions` (a name -> version mapping), agents still on that version are kept.
+        """
+        with self._lock:
+            for name, version in list(self._idle):
+                if keep_versions is None or keep_versions.get(name) != version:
+                    self.stats['discarded'] += len(self._idle.pop((name, version)))
+
+def reset_agent(agent):
+    """
+    Clears the state a Crew attaches to an agent during a run.
+
+    Memory, the tool-result cache and the executor all hang off the Crew that last
+    used the agent, so detaching them is what keeps requests isolated.
+    """
+    agent.crew = None
+    agent.agent_executor = None
+    agent.cache_handler = None
+    agent.tools_results = []
+    agent._times_executed = 0
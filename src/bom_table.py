@@ -0,0 +1,77 @@
+# src/bom_table.py
+
+# Standard library imports
+import re # Used to spot table separator rows and normalize component names.
+
+# --- Column Layout ---
+
+# Columns the sourcing stage is asked to produce for the final Bill of Materials.
+FINAL_BOM_COLUMNS = ['Sl no.', 'Component Name', 'Quantity', 'Price (INR)', 'Purchase URL']
+
+# Header keywords used to map loosely named LLM table columns onto FINAL_BOM_COLUMNS.
+# 'Sl no.' is left out because render_markdown_table numbers rows itself.
+FINAL_BOM_KEYWORDS = {
+    'Component Name': ('component', 'item', 'name'),
+    'Quantity': ('quantity', 'qty'),
+    'Price (INR)': ('price', 'cost'),
+    'Purchase URL': ('url', 'link', 'source'),
+}
+
+# --- Parsing and Rendering ---
+
+def parse_markdown_table(text):
+    """
+    Parses the first markdown table found in `text` into a list of row dicts keyed by header.
+    Returns an empty list when no table is present.
+    """
+    headers, rows = None, []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith('|'):
+            # The table ends at the first non-table line once it has started.
+            if headers is not None:
+                break
+            continue
+        cells = [cell.strip() for cell in line.strip('|').split('|')]
+        if headers is None:
+            headers = cells
+        elif all(re.fullmatch(r":?-{2,}:?", cell) for cell in cells if cell):
+            continue # Skip the '|---|---|' separator row.
+        else:
+            rows.append(dict(zip(headers, cells)))
+    return rows
+
+def render_markdown_table(columns, rows):
+    """
+    Renders row dicts as a markdown table with the given columns, numbering the 'Sl no.' column.
+    """
+    lines = ["| " + " | ".join(columns) + " |", "|" + "|".join("---" for _ in columns) + "|"]
+    for number, row in enumerate(rows, start=1):
+        cells = [str(number) if column == 'Sl no.' else str(row.get(column, '')) for column in columns]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+def row_value(row, *keywords, default=''):
+    """
+    Returns the value of the first column whose header contains any of `keywords` (case-insensitive).
+    LLM-written tables vary their headers ('Price', 'Price (INR)', 'Est. Price'), so exact keys are unreliable.
+    """
+    for keyword in keywords:
+        for header, value in row.items():
+            if keyword.lower() in header.lower():
+                return value
+    return default
+
+def to_final_bom_row(row):
+    """
+    Maps a row from an agent-written table onto the FINAL_BOM_COLUMNS layout, using 'N/A' for gaps.
+    """
+    return {column: row_value(row, *keywords, default='N/A') for column, keywords in FINAL_BOM_KEYWORDS.items()}
+
+def normalize_component_name(name):
+    """
+    Normalizes a component name into a lookup key, e.g. '**Arduino Uno R3**' -> 'arduino uno r3'.
+    """
+    name = re.sub(r"[*_`]", "", name).casefold()
+    name = re.sub(r"[^a-z0-9.+\-]+", " ", name)
+    return " ".join(name.split())
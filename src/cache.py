@@ -0,0 +1,270 @@
+# src/cache.py
+
+# Standard library imports
+import hashlib # Builds content-addressed cache keys.
+import json # Canonicalizes key parts and serializes values for the disk tier.
+import os # Reads the crew result cache settings from environment variables.
+import sqlite3 # Backs the optional on-disk cache tier.
+import threading # Keeps the caches safe to share across request threads.
+import time # Drives TTL expiry.
+from collections import OrderedDict # Gives the in-memory tier its LRU ordering.
+from contextlib import contextmanager # Wraps SQLite connections so they are always closed.
+
+# Project root; default data files live here, so the app can start from any working directory.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def data_path(filename):
+    """
+    Default location of one of the app's data files (SQLite stores, tool description cache).
+    """
+    return os.path.join(PROJECT_ROOT, filename)
+
+@contextmanager
+def sqlite_connection(path, rows=False):
+    """
+    One short-lived SQLite connection per operation, shared by every SQLite-backed store.
+    `with conn` commits or rolls back; `rows=True` returns sqlite3.Row rows.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    if rows:
+        conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+# --- Key Helpers ---
+
+def make_key(*parts):
+    """
+    Builds a stable SHA-256 key from any JSON-serializable parts.
+    Dicts are serialized with sorted keys so argument order never changes the key.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def normalize_text(value):
+    """
+    Normalizes free text for cache keys: case-folded, trimmed, with whitespace collapsed.
+    Non-string values are returned unchanged.
+    """
+    if not isinstance(value, str):
+        return value
+    return " ".join(value.split()).casefold()
+
+# --- In-Memory Tier ---
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    Counters for hits, misses, evictions and expirations are kept in `stats`.
+    """
+    def __init__(self, max_size=256, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key`, or `default` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def peek(self, key, default=None):
+        """
+        Like `get`, but leaves the counters and LRU order untouched; for re-checks of a
+        key whose lookup has already been counted.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                return default
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores `value` under `key`, evicting the least recently used entries when full.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+# --- On-Disk Tier ---
+
+class SQLiteCache:
+    """
+    A small persistent key/value cache stored in SQLite, with the same TTL semantics
+    as TTLCache. Values must be JSON-serializable.
+    """
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        with sqlite_connection(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def get(self, key, default=None):
+        with self._lock, sqlite_connection(self.path) as conn:
+            row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return default
+            if row[1] < time.time():
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return default
+            self.stats['hits'] += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, json.dumps(value), expires_at))
+
+    def delete(self, key):
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        """
+        Deletes every expired row and returns how many were removed.
+        """
+        with self._lock, sqlite_connection(self.path) as conn:
+            removed = conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),)).rowcount
+        self.stats['evictions'] += removed
+        return removed
+
+# --- Two-Tier Result Cache ---
+
+class ResultCache:
+    """
+    Combines a fast in-memory TTLCache with an optional SQLiteCache behind it.
+    Disk hits are promoted into memory so repeat lookups stay in-process.
+    """
+    def __init__(self, max_size=256, ttl=3600, disk_path=None):
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.disk = SQLiteCache(disk_path, ttl=ttl) if disk_path else None
+        if self.disk is not None:
+            self.disk.purge_expired()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def delete(self, key):
+        """
+        Removes `key` from both tiers, e.g. when a cached output turns out to be unusable.
+        """
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self):
+        """
+        Returns the counters of both tiers, plus the current in-memory size.
+        """
+        report = {'memory': dict(self.memory.stats, size=len(self.memory))}
+        if self.disk is not None:
+            report['disk'] = dict(self.disk.stats)
+        return report
+
+# --- Request Coalescing ---
+
+class _InFlightCall:
+    """
+    Holds the outcome of one in-progress call so that waiting callers can share it.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into a single execution.
+
+    The first caller for a key runs the function; anyone arriving while it is still running
+    waits and receives the same result (or exception) instead of repeating the work.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {'executed': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        """
+        Runs `fn()` for `key`, or waits for the identical call already in flight.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _InFlightCall()
+                self.stats['executed'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+# --- Crew Result Cache ---
+
+# Process-wide cache of raw crew outputs. Set RESULT_CACHE_DB to a file path to also persist results on disk.
+# It lives here rather than in crew.py so its stats can be read without importing CrewAI.
+RESULT_CACHE = ResultCache(
+    max_size=int(os.getenv("RESULT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", str(24 * 3600))),
+    disk_path=os.getenv("RESULT_CACHE_DB") or None,
+)
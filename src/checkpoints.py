@@ -0,0 +1,91 @@
+# src/checkpoints.py
+
+# Standard library imports
+import json # Serializes sourced component rows.
+import os # Reads the store location from environment variables.
+import time # Timestamps checkpoint entries.
+
+# Local application imports
+from src.cache import data_path, sqlite_connection # Shared SQLite connection helper and data file location.
+from src.bom_table import normalize_component_name # Keys sourced components the same way as the price index.
+
+# --- Checkpoint Store ---
+
+class CheckpointStore:
+    """
+    Keeps each session's Stage 2 progress so a paused run can resume where it stopped.
+
+    Checkpoints are keyed by session id, so concurrent users never see or clear each other's
+    progress. Stage outputs (project name, conceptual BOM) and individually sourced components
+    are stored separately; every write is a single SQLite transaction, so a crash never leaves
+    a half-written checkpoint behind.
+    """
+    def __init__(self, path):
+        self.path = path
+        with sqlite_connection(self.path) as conn:
+            # WAL lets readers in other worker processes proceed while a write is in progress.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stage_values ("
+                "session_id TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (session_id, name))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sourced_components ("
+                "session_id TEXT NOT NULL, name_key TEXT NOT NULL, row TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (session_id, name_key))"
+            )
+
+    def save(self, session_id, **values):
+        """
+        Atomically stores one or more named stage outputs for a session.
+        """
+        now = time.time()
+        with sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO stage_values (session_id, name, value, updated_at) VALUES (?, ?, ?, ?)",
+                [(session_id, name, value, now) for name, value in values.items()],
+            )
+
+    def load(self, session_id):
+        """
+        Returns every stage output saved for a session as a dict (empty if there is no checkpoint).
+        """
+        with sqlite_connection(self.path) as conn:
+            rows = conn.execute("SELECT name, value FROM stage_values WHERE session_id = ?", (session_id,)).fetchall()
+        return dict(rows)
+
+    def record_components(self, session_id, rows):
+        """
+        Atomically marks final-BOM rows (see bom_table.FINAL_BOM_COLUMNS) as sourced for a session.
+        """
+        now = time.time()
+        entries = [
+            (session_id, normalize_component_name(row['Component Name']), json.dumps(row), now)
+            for row in rows if row.get('Component Name')
+        ]
+        with sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sourced_components (session_id, name_key, row, updated_at) VALUES (?, ?, ?, ?)",
+                entries,
+            )
+        return len(entries)
+
+    def sourced_components(self, session_id):
+        """
+        Returns the components already sourced for a session, keyed by normalized component name.
+        """
+        with sqlite_connection(self.path) as conn:
+            rows = conn.execute("SELECT name_key, row FROM sourced_components WHERE session_id = ?", (session_id,)).fetchall()
+        return {name_key: json.loads(row) for name_key, row in rows}
+
+    def clear(self, session_id):
+        """
+        Deletes all of a session's progress in one transaction.
+        """
+        with sqlite_connection(self.path) as conn:
+            conn.execute("DELETE FROM stage_values WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sourced_components WHERE session_id = ?", (session_id,))
+
+# Process-wide store; point CHECKPOINT_DB at shared storage when running several workers.
+CHECKPOINTS = CheckpointStore(os.getenv("CHECKPOINT_DB", data_path("checkpoints.sqlite3")))
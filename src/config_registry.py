@@ -0,0 +1,231 @@
+# src/config_registry.py
+
+# Standard library imports
+import os # Locates and stats the config files.
+import re # Finds `{placeholder}` inputs in task templates.
+import threading # Runs the file watcher and guards snapshot swaps.
+import time # Timestamps each loaded snapshot.
+from types import MappingProxyType # Makes published snapshots read-only.
+
+# Third-party library imports
+import yaml # Parses agents.yaml and tasks.yaml.
+
+# Local application imports
+from src.cache import make_key # Content hashes for templates and whole snapshots.
+
+# Required non-empty string fields for each kind of template.
+AGENT_FIELDS = ('role', 'goal', 'backstory')
+TASK_FIELDS = ('description', 'expected_output')
+
+# Matches the `{name}` placeholders CrewAI interpolates into task templates.
+PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+class ConfigError(ValueError):
+    """
+    Raised when agents.yaml or tasks.yaml is unreadable or fails validation.
+    """
+
+# --- Config Snapshots ---
+
+class ConfigSnapshot:
+    """
+    One validated, read-only version of the agent and task templates.
+
+    Each template has a content hash, usable as a cache key: it changes exactly when that
+    template's text changes. `version` hashes the whole snapshot. A crew run holds on to
+    the snapshot it started with, so a reload never mixes old and new templates in one run.
+    """
+    def __init__(self, agents, tasks):
+        self.agents = MappingProxyType({name: MappingProxyType(dict(config)) for name, config in agents.items()})
+        self.tasks = MappingProxyType({name: MappingProxyType(dict(config)) for name, config in tasks.items()})
+        self.agent_hashes = MappingProxyType({name: make_key(config) for name, config in agents.items()})
+        self.task_hashes = MappingProxyType({name: make_key(config) for name, config in tasks.items()})
+        self.version = make_key(dict(self.agent_hashes), dict(self.task_hashes))
+        self.loaded_at = time.time()
+
+    def changed_templates(self, other):
+        """
+        Names of the agents and tasks whose content differs from `other` (added, removed or edited).
+        """
+        def diff(mine, theirs):
+            return sorted(name for name in set(mine) | set(theirs) if mine.get(name) != theirs.get(name))
+        return {'agents': diff(self.agent_hashes, other.agent_hashes), 'tasks': diff(self.task_hashes, other.task_hashes)}
+
+def validate_templates(agents, tasks, task_inputs=None):
+    """
+    Checks the shape of the parsed YAML and returns a list of problems (empty if valid).
+    `task_inputs` maps task names to the inputs they receive; each must exist, and its
+    `{placeholders}` must all be among those inputs.
+    """
+    problems = []
+    for kind, templates, fields in (('agent', agents, AGENT_FIELDS), ('task', tasks, TASK_FIELDS)):
+        for name, config in templates.items():
+            if not isinstance(config, dict):
+                problems.append(f"{kind} '{name}' must be a mapping.")
+                continue
+            for field in fields:
+                if not isinstance(config.get(field), str) or not config[field].strip():
+                    problems.append(f"{kind} '{name}' needs a non-empty '{field}'.")
+    for task_name, inputs in (task_inputs or {}).items():
+        config = tasks.get(task_name)
+        if not isinstance(config, dict):
+            problems.append(f"task '{task_name}' is missing.")
+            continue
+        used = set(PLACEHOLDER.findall(f"{config.get('description', '')} {config.get('expected_output', '')}"))
+        for placeholder in sorted(used - set(inputs)):
+            problems.append(f"task '{task_name}' uses '{{{placeholder}}}', which is never provided.")
+    return problems
+
+# --- Config Registry ---
+
+class ConfigRegistry:
+    """
+    Loads, validates and publishes the agent and task templates, and reloads them when
+    agents.yaml or tasks.yaml changes.
+
+    A reload builds and validates a complete new snapshot before swapping it in with a
+    single reference assignment, so requests in flight keep the snapshot they started with
+    and new requests see either the old templates or the new ones, never a mix. An edit
+    that fails validation is rejected and the previous snapshot stays live.
+    """
+    def __init__(self, config_dir, task_inputs=None, required_agents=(), validator=None):
+        """
+        `validator`, if given, is called with each candidate snapshot and may raise to reject it
+        (e.g. by building the CrewAI models once).
+        """
+        self.paths = {
+            'agents': os.path.join(config_dir, 'agents.yaml'),
+            'tasks': os.path.join(config_dir, 'tasks.yaml'),
+        }
+        self.task_inputs = task_inputs or {}
+        self.required_agents = tuple(required_agents)
+        self.validator = validator
+        self.stats = {'reloads': 0, 'rejected': 0}
+        self.last_error = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stamps = self._file_stamps()
+        # The initial load must succeed: there is no previous snapshot to fall back on.
+        self._snapshot = self._build_snapshot()
+
+    def snapshot(self):
+        """
+        Returns the current snapshot. Hold on to it for the duration of a run.
+        """
+        return self._snapshot
+
+    def on_change(self, listener):
+        """
+        Registers `listener(old_snapshot, new_snapshot)`, called after each successful reload.
+        """
+        self._listeners.append(listener)
+
+    def _file_stamps(self):
+        stamps = {}
+        for kind, path in self.paths.items():
+            try:
+                stat = os.stat(path)
+                stamps[kind] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamps[kind] = None
+        return stamps
+
+    def _build_snapshot(self):
+        parsed = {}
+        for kind, path in self.paths.items():
+            try:
+                with open(path, 'r') as f:
+                    document = yaml.safe_load(f) or {}
+            except (OSError, yaml.YAMLError) as e:
+                raise ConfigError(f"Could not read {path}: {e}")
+            if not isinstance(document.get(kind), dict):
+                raise ConfigError(f"{path} must have a top-level '{kind}' mapping.")
+            parsed[kind] = document[kind]
+
+        problems = validate_templates(parsed['agents'], parsed['tasks'], self.task_inputs)
+        problems += [f"agent '{name}' is missing." for name in self.required_agents if name not in parsed['agents']]
+        if problems:
+            raise ConfigError("Invalid agent/task config: " + " ".join(problems))
+        snapshot = ConfigSnapshot(parsed['agents'], parsed['tasks'])
+        if self.validator is not None:
+            try:
+                self.validator(snapshot)
+            except Exception as e:
+                raise ConfigError(f"Invalid agent/task config: {e}")
+        return snapshot
+
+    def reload(self):
+        """
+        Re-reads both files and swaps in the new snapshot if it is valid.
+        Returns True if the templates changed; raises ConfigError if the files are invalid.
+        """
+        with self._lock:
+            stamps = self._file_stamps()
+            try:
+                snapshot = self._build_snapshot()
+            except ConfigError as e:
+                self.stats['rejected'] += 1
+                self.last_error = str(e)
+                self._stamps = stamps # Do not retry until the files change again.
+                raise
+            if self._file_stamps() != stamps:
+                # A file changed while it was being read; the watcher picks up the final version.
+                return False
+            self._stamps = stamps
+            self.last_error = None
+            old = self._snapshot
+            if snapshot.version == old.version:
+                return False
+            self._snapshot = snapshot
+            self.stats['reloads'] += 1
+
+        changed = snapshot.changed_templates(old)
+        print(f"🔄 Reloaded agent/task config (agents: {', '.join(changed['agents']) or 'none'}; tasks: {', '.join(changed['tasks']) or 'none'}).")
+        for listener in self._listeners:
+            listener(old, snapshot)
+        return True
+
+    def check_for_changes(self):
+        """
+        Reloads if either file's modification time or size has changed since the last load.
+        """
+        if self._file_stamps() == self._stamps:
+            return False
+        try:
+            return self.reload()
+        except ConfigError as e:
+            print(f"⚠️ Rejected the edited config; keeping the previous version. {e}")
+            return False
+
+    def start_watching(self, interval=2.0):
+        """
+        Polls the config files every `interval` seconds on a background thread.
+        """
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check_for_changes()
+                except Exception as e:
+                    print(f"❌ Config watcher error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        """
+        Reports the live snapshot's version and per-template hashes, plus reload counters.
+        """
+        snapshot = self._snapshot
+        return dict(
+            self.stats,
+            version=snapshot.version,
+            loaded_at=snapshot.loaded_at,
+            last_error=self.last_error,
+            agents=dict(snapshot.agent_hashes),
+            tasks=dict(snapshot.task_hashes),
+        )
@@ -2,38 +2,183 @@
 
 # Standard library imports
 import os # Provides functions for interacting with the operating system, like accessing environment variables.
-import yaml # Library for parsing YAML files, used here for configuration.
+import threading # Guards per-request agent checkout when crews run on parallel threads.
 
 # Third-party library imports
 from crewai import Agent, Crew, Process, Task # Core components from the CrewAI framework for defining agents, crews, processes, and tasks.
 from crewai.llm import LLM # Used to define and configure Large Language Models for agents.
+from crewai.events import crewai_event_bus, LLMStreamChunkEvent # Lets us forward streamed LLM tokens to the UI.
 
 # Local application imports
-from src.tools.composio_tools import tools_for_agents # Imports custom tools for agents from the composio_tools module.
+from src.agent_pool import AgentPool # Process-wide pool that reuses agents across requests.
+from src.bom_table import normalize_component_name # Keys sourcing results by part name.
+from src.cache import RESULT_CACHE, make_key, normalize_text # Content-addressed cache for crew results.
+from src.config_registry import ConfigRegistry # Validated, hashed, hot-reloaded agent and task templates.
+from src.jobs import publish_event # Pushes events to the progress stream of the job being worked on.
+from src.observability import METRICS, TRACER, instrument_llm, record_stream_chunk # Spans and metrics for crew runs and LLM calls.
+from src.rate_limiter import BULK, INTERACTIVE, RATE_LIMITER, priority_lane # Process-wide adaptive limiter for Gemini calls.
+from src.structured_output import StructuredOutputError, parse_output # Schema-typed parsing of crew outputs.
+from src.tools.agent_tools import get_agent_tools # Builds the Composio-backed tools the first time an agent needs them.
 
 # --- Configuration and Initialization ---
 
 # Retrieve API key for Google Gemini models from environment variables.
 # It checks for both GOOGLE_API_KEY and GEMINI_API_KEY for flexibility.
 api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-if not api_key:
+# LLM_BACKEND=stub answers every call locally (see src/llm_stub.py), for benchmarks and offline runs.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+if not api_key and LLM_BACKEND != "stub":
     # Raise an error if no API key is found, as it's essential for LLM operation.
     raise ValueError("FATAL ERROR: GOOGLE_API_KEY or GEMINI_API_KEY not found in .env file.")
 
+def create_llm(**settings):
+    """
+    Creates an LLM client routed through the process-wide RATE_LIMITER, answered by the
+    local stub instead of Gemini when LLM_BACKEND=stub. Each request to the model is traced.
+    """
+    llm = LLM(api_key=api_key or "stub", **settings)
+    if LLM_BACKEND == "stub":
+        from src.llm_stub import install_stub # Only needed for offline runs.
+        install_stub(llm)
+    return RATE_LIMITER.install(instrument_llm(llm, TRACER, METRICS))
+
 # Initialize different LLM instances for manager and worker agents.
 # manager_llm uses a more powerful model (gemini-2.5-pro) for complex orchestration.
-manager_llm = LLM(model="gemini/gemini-2.5-pro", api_key=api_key)
+manager_llm = create_llm(model="gemini/gemini-2.5-pro")
 # worker_llm uses a faster, lighter model (gemini-2.5-flash) for individual tasks.
-worker_llm = LLM(model="gemini/gemini-2.5-flash", api_key=api_key)
+# It streams its output so partial results can be shown to the user as they are generated.
+# Both clients share the process-wide RATE_LIMITER, which paces calls per model and retries 429s.
+worker_llm = create_llm(model="gemini/gemini-2.5-flash", stream=True)
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def forward_llm_chunk(source, event):
+    """
+    Forwards each streamed text chunk to the job whose crew requested it, and times the
+    request's first chunk. CrewAI emits these events on the calling thread, so the current
+    job and LLM span are the right ones.
+    """
+    record_stream_chunk()
+    if event.tool_call is None:
+        publish_event('token', agent=event.agent_role, chunk=event.chunk)
+
+# --- Agent Definitions ---
+
+# Per-agent construction settings; the role, goal and backstory come from agents.yaml.
+AGENT_SETTINGS = {
+    # Project Architect: Responsible for initial project planning.
+    'project_architect': dict(llm=worker_llm, memory=True, verbose=True),
+    # Project Namer: Responsible for generating project names.
+    'project_namer': dict(llm=worker_llm, memory=True, verbose=True),
+    # System Designer: Responsible for designing conceptual Bill of Materials (BOM).
+    'system_designer': dict(llm=worker_llm, memory=True, verbose=True),
+    # Parts Sourcer: Utilizes external tools to source one BOM component per run.
+    # Two searches and a final answer fit well within max_iter, so a stuck part gives up quickly.
+    'parts_sourcer': dict(llm=worker_llm, memory=True, verbose=True, max_iter=6),
+    # Diagram Specialist: Generates various project diagrams (e.g., workflow, architecture).
+    'diagram_specialist': dict(llm=worker_llm, memory=True, verbose=True),
+    # Code Wizard: Generates code snippets, typically for microcontrollers like Arduino.
+    'code_wizard': dict(llm=worker_llm, memory=True, verbose=True),
+}
+
+# Agents that use external tools, mapped to a function returning them. Tools are only
+# loaded when one of these agents is first built, so importing this module stays offline.
+AGENT_TOOLS = {
+    # Parts Sourcer: Integrates external tools for sourcing.
+    'parts_sourcer': get_agent_tools,
+}
+
+def build_agent(name, config=None):
+    """
+    Builds a single agent from its YAML config (from the given snapshot, or the live one)
+    and construction settings.
+    """
+    config = config or CONFIG.snapshot()
+    tools = AGENT_TOOLS[name]() if name in AGENT_TOOLS else []
+    return Agent(config=dict(config.agents[name]), tools=tools, **AGENT_SETTINGS[name])
+
+# Process-wide pool shared by every request; agents are only built the first time they are needed.
+AGENT_POOL = AgentPool(build_agent)
+
+# --- Agent and Task Config ---
+
+# Maps each stage to the crew method that runs it and the task/agent pair it uses.
+STAGES = {
+    'planning': ('planning_crew', 'project_planning_task', 'project_architect'),
+    'naming': ('naming_crew', 'project_naming_task', 'project_namer'),
+    'design': ('design_crew', 'component_reasoning_task', 'system_designer'),
+    'sourcing': ('sourcing_crew', 'component_sourcing_task', 'parts_sourcer'),
+    'diagrams': ('diagram_generation_crew', 'diagram_generation_task', 'diagram_specialist'),
+    'code': ('code_generation_crew', 'code_generation_task', 'code_wizard'),
+}
+
+# The inputs each task is kicked off with; its `{placeholders}` must be among them.
+TASK_INPUTS = {
+    'project_planning_task': {'project_details'},
+    'project_naming_task': {'project_details'},
+    'component_reasoning_task': {'project_plan'},
+    'component_sourcing_task': {'component_name', 'quantity', 'purpose'},
+    'diagram_generation_task': {'final_bom', 'project_plan'},
+    'code_generation_task': {'final_bom'},
+}
 
-# Load agent configurations from a YAML file.
-# This externalizes agent definitions, making them easier to manage and update.
-with open('src/config/agents.yaml', 'r') as f:
-    AGENTS_CONFIG = yaml.safe_load(f)
-# Load task configurations from a YAML file.
-# This externalizes task definitions, allowing for flexible task management.
-with open('src/config/tasks.yaml', 'r') as f:
-    TASKS_CONFIG = yaml.safe_load(f)
+def validate_with_crewai(snapshot):
+    """
+    Builds each task template once with CrewAI's own models, so an invalid field is
+    rejected when the config is loaded rather than in the middle of a user's run.
+    """
+    for task_name in TASK_INPUTS:
+        Task(**snapshot.tasks[task_name])
+
+def on_config_change(old, new):
+    # Drop idle agents built from templates that just changed; the rest stay pooled.
+    AGENT_POOL.clear(keep_versions=new.agent_hashes)
+
+# YAML configs are found relative to this file, so the app can start from any working directory.
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+
+# Process-wide registry of agent and task templates. Edits to the YAML files are picked up
+# every CONFIG_RELOAD_INTERVAL seconds (0 disables watching) without restarting the app.
+CONFIG = ConfigRegistry(CONFIG_DIR, task_inputs=TASK_INPUTS, required_agents=AGENT_SETTINGS, validator=validate_with_crewai)
+CONFIG.on_change(on_config_change)
+CONFIG.start_watching(float(os.getenv("CONFIG_RELOAD_INTERVAL", "2")))
+
+# --- Result Cache ---
+
+# Stages whose LLM calls yield to interactive ones when the rate limit is tight.
+BULK_STAGES = {'sourcing'}
+
+def stage_lane(stage):
+    """
+    The rate limiter lane for every LLM call a stage makes, its crew's and its repairs' alike.
+    """
+    return priority_lane(BULK if stage in BULK_STAGES else INTERACTIVE)
+
+# A sourcing result depends only on the part: its quantity is taken from the conceptual row and
+# its purpose (worded differently in every project) only guides the search. Keying on the
+# part name lets the same part in a later project be served from the cache.
+CACHE_KEY_INPUTS = {'sourcing': {'component_name': normalize_component_name}}
+
+def result_cache_key(stage, inputs, config):
+    """
+    Builds the content-addressed key for a stage run: task name, the content hashes of the
+    task and agent templates in `config`, the agent's model, and the normalized inputs
+    (only those listed in CACHE_KEY_INPUTS, for the stages that have an entry there).
+    """
+    _, task_name, agent_name = STAGES[stage]
+    config_hash = make_key(config.task_hashes[task_name], config.agent_hashes[agent_name])
+    model = AGENT_SETTINGS[agent_name]['llm'].model
+    if stage in CACHE_KEY_INPUTS:
+        normalized_inputs = {name: normalize(inputs[name]) for name, normalize in CACHE_KEY_INPUTS[stage].items()}
+    else:
+        normalized_inputs = {name: normalize_text(value) for name, value in inputs.items()}
+    return make_key(task_name, config_hash, model, normalized_inputs)
+
+class CachedCrewOutput:
+    """
+    Stands in for a CrewOutput when a stage is served from the cache; only `raw` is kept.
+    """
+    def __init__(self, raw):
+        self.raw = raw
 
 # --- ProjectPartnerCrew Class Definition ---
 
@@ -41,73 +186,164 @@ class ProjectPartnerCrew:
     """
     Manages the creation and orchestration of various AI agents and their respective crews
     for different stages of a project development lifecycle.
+
+    Agents are checked out of the shared AGENT_POOL only when a crew needs them, so use
+    the manager as a context manager (or call `release()`) to hand them back.
     """
-    def __init__(self):
-        """
-        Initializes the ProjectPartnerCrew by defining and configuring individual agents.
-        Each agent is assigned a specific role and an LLM.
-        """
-        self.agents = {
-            # Project Architect: Responsible for initial project planning.
-            'project_architect': Agent(config=AGENTS_CONFIG['agents']['project_architect'], llm=worker_llm, memory=True, verbose=True),
-            # Project Namer: Responsible for generating project names.
-            'project_namer': Agent(config=AGENTS_CONFIG['agents']['project_namer'], llm=worker_llm, memory=True, verbose=True),
-            # System Designer: Responsible for designing conceptual Bill of Materials (BOM).
-            'system_designer': Agent(config=AGENTS_CONFIG['agents']['system_designer'], llm=worker_llm, memory=True, verbose=True),
-            # Parts Sourcer: Utilizes external tools to source final parts for the BOM.
-            'parts_sourcer': Agent(config=AGENTS_CONFIG['agents']['parts_sourcer'],
-                        tools=tools_for_agents, # Integrates external tools for sourcing.
-                       llm=worker_llm, memory=True, verbose=True, max_iter=25, max_rpm=4),
-            # Diagram Specialist: Generates various project diagrams (e.g., workflow, architecture).
-            'diagram_specialist': Agent(config=AGENTS_CONFIG['agents']['diagram_specialist'], llm=worker_llm, memory=True, verbose=True, max_rpm=4),
-            # Code Wizard: Generates code snippets, typically for microcontrollers like Arduino.
-            'code_wizard': Agent(config=AGENTS_CONFIG['agents']['code_wizard'], llm=worker_llm, memory=True, verbose=True)
-        }
+    def __init__(self, config=None):
+        """
+        Initializes the ProjectPartnerCrew with no agents checked out yet. The current
+        config snapshot (or `config`) is pinned, so every crew in this run uses the same templates.
+        """
+        self.config = config or CONFIG.snapshot()
+        self.agents = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def agent(self, name):
+        """
+        Returns this request's copy of an agent, checking it out of the pool on first use.
+        """
+        with self._lock:
+            if name not in self.agents:
+                self.agents[name] = AGENT_POOL.acquire(name, version=self.config.agent_hashes[name], config=self.config)
+            return self.agents[name]
+
+    def fork(self):
+        """
+        Returns a new manager pinned to the same config snapshot, with its own agents. Crews
+        that run concurrently on one stage (e.g. one per component) each use a fork, since an
+        agent must not run two tasks at once.
+        """
+        return ProjectPartnerCrew(config=self.config)
+
+    def release(self):
+        """
+        Returns every agent this request checked out to the shared pool.
+        """
+        live_hashes = CONFIG.snapshot().agent_hashes
+        for name, agent in self.agents.items():
+            # Agents whose template changed during this run are dropped instead of pooled.
+            if live_hashes.get(name) == self.config.agent_hashes[name]:
+                AGENT_POOL.release(name, agent, version=self.config.agent_hashes[name])
+        self.agents = {}
+
+    def kickoff(self, stage, inputs):
+        """
+        Runs one stage's crew, serving repeat requests from RESULT_CACHE.
+
+        Returns the crew's output (or a CachedCrewOutput on a hit); either way the text is in `.raw`.
+        Outputs that report a rate limit are never cached so the stage is retried next time.
+        """
+        crew_method, task_name, agent_name = STAGES[stage]
+        with TRACER.span('crew.kickoff', kind='crew', stage=stage, task=task_name, agent=agent_name) as span:
+            key = result_cache_key(stage, inputs, self.config)
+            cached = RESULT_CACHE.get(key)
+            span.set(cache_hit=cached is not None)
+            if cached is not None:
+                print(f"⚡ Cache hit for the {stage} stage.")
+                return CachedCrewOutput(cached)
+
+            with stage_lane(stage):
+                result = getattr(self, crew_method)().kickoff(inputs=inputs)
+            if result.raw and "RATE_LIMIT_HIT" not in result.raw:
+                RESULT_CACHE.set(key, result.raw)
+            return result
+
+    def parse(self, stage, inputs, result, model):
+        """
+        Parses a stage's output into `model` (see structured_output.parse_output), re-asking
+        only for the fragments that fail validation. An output that cannot be repaired is
+        evicted from RESULT_CACHE, so the next attempt reruns the crew instead of replaying it.
+        """
+        try:
+            # Re-asks for invalid fragments wait in the same rate limiter lane as the stage itself.
+            with TRACER.span('crew.parse', kind='crew', stage=stage), stage_lane(stage):
+                return parse_output(result.raw, model, reask=self.reask, label=f"{stage} output", context=self.task_prompt(stage, inputs))
+        except StructuredOutputError:
+            self.forget(stage, inputs)
+            raise
+
+    def forget(self, stage, inputs):
+        """
+        Evicts a stage run's cached output, so the next request with these inputs reruns the crew.
+        """
+        RESULT_CACHE.delete(result_cache_key(stage, inputs, self.config))
+
+    def task_prompt(self, stage, inputs):
+        """
+        Returns a stage's task description with its inputs filled in, as the agent saw it.
+        """
+        _, task_name, _ = STAGES[stage]
+        prompt = self.config.tasks[task_name]['description']
+        for name, value in inputs.items():
+            prompt = prompt.replace('{' + name + '}', str(value))
+        return prompt
+
+    def reask(self, prompt):
+        """
+        Sends a short corrective prompt straight to the worker LLM, without an agent loop, and
+        returns its reply. Used to repair only the invalid parts of a structured output; replies
+        are cached so repairing the same cached output again costs nothing.
+        """
+        key = make_key('reask', worker_llm.model, prompt)
+        cached = RESULT_CACHE.get(key)
+        if cached is not None:
+            return cached
+        reply = worker_llm.call([{"role": "user", "content": prompt}])
+        if reply:
+            RESULT_CACHE.set(key, reply)
+        return reply
 
     def planning_crew(self):
         """
         Creates a crew for initial project planning.
         The project_architect agent handles the 'project_planning_task'.
         """
-        task = Task(**TASKS_CONFIG['tasks']['project_planning_task'], agent=self.agents['project_architect'])
-        return Crew(agents=[self.agents['project_architect']], tasks=[task], process=Process.sequential, verbose=True)
+        task = Task(**self.config.tasks['project_planning_task'], agent=self.agent('project_architect'))
+        return Crew(agents=[self.agent('project_architect')], tasks=[task], process=Process.sequential, verbose=True)
 
     def naming_crew(self):
         """
         Creates a crew for generating project names.
         The project_namer agent handles the 'project_naming_task'.
         """
-        task = Task(**TASKS_CONFIG['tasks']['project_naming_task'], agent=self.agents['project_namer'])
-        return Crew(agents=[self.agents['project_namer']], tasks=[task], process=Process.sequential, verbose=True)
+        task = Task(**self.config.tasks['project_naming_task'], agent=self.agent('project_namer'))
+        return Crew(agents=[self.agent('project_namer')], tasks=[task], process=Process.sequential, verbose=True)
 
     def design_crew(self):
         """
         Creates a crew for designing the conceptual Bill of Materials (BOM).
         The system_designer agent handles the 'component_reasoning_task'.
         """
-        task = Task(**TASKS_CONFIG['tasks']['component_reasoning_task'], agent=self.agents['system_designer'])
-        return Crew(agents=[self.agents['system_designer']], tasks=[task], process=Process.sequential, verbose=True)
+        task = Task(**self.config.tasks['component_reasoning_task'], agent=self.agent('system_designer'))
+        return Crew(agents=[self.agent('system_designer')], tasks=[task], process=Process.sequential, verbose=True)
 
     def sourcing_crew(self):
         """
-        Creates a crew for sourcing final parts based on the conceptual BOM.
+        Creates a crew for sourcing one component of the conceptual BOM.
         The parts_sourcer agent handles the 'component_sourcing_task'.
         """
-        task = Task(**TASKS_CONFIG['tasks']['component_sourcing_task'], agent=self.agents['parts_sourcer'])
-        return Crew(agents=[self.agents['parts_sourcer']], tasks=[task], process=Process.sequential, verbose=True)
+        task = Task(**self.config.tasks['component_sourcing_task'], agent=self.agent('parts_sourcer'))
+        return Crew(agents=[self.agent('parts_sourcer')], tasks=[task], process=Process.sequential, verbose=True)
 
     def diagram_generation_crew(self):
         """
         Creates a crew for generating project diagrams.
         The diagram_specialist agent handles the 'diagram_generation_task'.
         """
-        task = Task(**TASKS_CONFIG['tasks']['diagram_generation_task'], agent=self.agents['diagram_specialist'])
-        return Crew(agents=[self.agents['diagram_specialist']], tasks=[task], process=Process.sequential, verbose=True)
+        task = Task(**self.config.tasks['diagram_generation_task'], agent=self.agent('diagram_specialist'))
+        return Crew(agents=[self.agent('diagram_specialist')], tasks=[task], process=Process.sequential, verbose=True)
 
     def code_generation_crew(self):
         """
         Creates a crew for generating code (e.g., Arduino sketches).
         The code_wizard agent handles the 'code_generation_task'.
         """
-        task = Task(**TASKS_CONFIG['tasks']['code_generation_task'], agent=self.agents['code_wizard'])
-        return Crew(agents=[self.agents['code_wizard']], tasks=[task], process=Process.sequential, verbose=True)
+        task = Task(**self.config.tasks['code_generation_task'], agent=self.agent('code_wizard'))
+        return Crew(agents=[self.agent('code_wizard')], tasks=[task], process=Process.sequential, verbose=True)
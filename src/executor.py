@@ -0,0 +1,61 @@
+# src/executor.py
+
+# Standard library imports
+import contextvars # Carries the caller's context (e.g. the current job) into worker threads.
+import time # Used to time each crew and the whole concurrent block.
+from concurrent.futures import ThreadPoolExecutor, as_completed # Runs independent crews side by side on worker threads.
+
+# --- Concurrent Stage Execution ---
+
+def iter_completed(jobs, label="Parallel block", max_workers=None):
+    """
+    Runs independent crew kickoffs at the same time and yields each one as soon as it finishes.
+
+    `jobs` maps a name to a zero-argument callable (usually a lambda around
+    `crew.kickoff(...)`). CrewAI's `kickoff_async` is itself a thread wrapper around
+    `kickoff`, so plain threads give the same concurrency without an event loop.
+
+    Yields `(name, result, elapsed_seconds)` tuples in completion order. If a job fails,
+    its exception is raised from the generator after the remaining jobs have finished.
+    At most `max_workers` jobs run at once (default: all of them).
+    """
+    def timed(fn):
+        # Wraps a job so its own wall-clock time is returned alongside its result.
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+    timings = {}
+    block_start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=min(max_workers or len(jobs), len(jobs)) or 1)
+    try:
+        # Each job runs in a copy of the caller's context so context-local state, such as
+        # the job whose progress stream it reports to, follows it onto the worker thread.
+        futures = {pool.submit(contextvars.copy_context().run, timed, fn): name for name, fn in jobs.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            result, elapsed = future.result()
+            timings[name] = elapsed
+            yield name, result, elapsed
+    finally:
+        # Never leave a crew running in the background, even if the caller stops early.
+        pool.shutdown(wait=True)
+
+    total = time.perf_counter() - block_start
+    per_job = ", ".join(f"{name}={timings[name]:.1f}s" for name in jobs)
+    print(f"⏱️ {label}: {total:.1f}s wall ({per_job}; sequential would take ~{sum(timings.values()):.1f}s)")
+
+def run_concurrently(jobs, label="Parallel block"):
+    """
+    Runs independent crew kickoffs at the same time and joins on all of them.
+
+    Returns a `(results, timings)` tuple of dicts keyed by job name; `timings` also
+    holds the wall-clock time of the whole block under 'total'.
+    """
+    results, timings = {}, {}
+    block_start = time.perf_counter()
+    for name, result, elapsed in iter_completed(jobs, label=label):
+        results[name] = result
+        timings[name] = elapsed
+    timings['total'] = time.perf_counter() - block_start
+    return results, timings
@@ -0,0 +1,379 @@
+# src/jobs.py
+
+# Standard library imports
+import contextvars # Tracks which job the current thread is working for, so progress reaches the right stream.
+import json # Serializes job results and events for the shared job store, and SSE payloads.
+import threading # Protects the job registry shared by request and worker threads.
+import time # Records queue, run and total timings for each job.
+import uuid # Generates job ids.
+from concurrent.futures import ThreadPoolExecutor # Bounded worker pool that runs the crews.
+
+# Local application imports
+from src.cache import sqlite_connection # Shared SQLite connection helper.
+from src.observability import METRICS, TRACER # Traces each stage run and records queue wait times.
+
+# Cap on stored events per job; token chunks beyond it are dropped so a runaway stream cannot exhaust memory.
+MAX_JOB_EVENTS = 20000
+
+# Token events are written to the job store in batches of this many, or this many seconds apart;
+# every other event is written at once.
+TOKEN_FLUSH_SIZE = 32
+TOKEN_FLUSH_SECONDS = 0.25
+
+# How often a worker following another worker's job checks the store for new events.
+STORE_POLL_SECONDS = 0.25
+
+# The job whose stage is running on the current thread (None outside a job).
+current_job = contextvars.ContextVar('current_job', default=None)
+
+JOB_QUEUE_SECONDS = METRICS.histogram('job_queue_seconds', "Time stage jobs waited for a free worker, by kind.")
+
+# --- Progress Reporting ---
+
+def report_progress(message, **data):
+    """
+    Prints a progress line and, when running inside a job, pushes it to the job's event stream.
+    """
+    print(message)
+    publish_event('progress', message=message, **data)
+
+def publish_event(event_type, **data):
+    """
+    Pushes an event to the current job's stream; a no-op outside a job.
+    """
+    job = current_job.get()
+    if job is not None:
+        job.emit(event_type, **data)
+
+# --- Shared Job Store ---
+
+class JobStore:
+    """
+    Keeps every job's status, timings, result and event log in SQLite, so any worker process
+    on the host can report on, stream and collect a job, not just the one running it.
+    """
+    def __init__(self, path):
+        self.path = path
+        with sqlite_connection(self.path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, owner TEXT NOT NULL, "
+                "status TEXT NOT NULL, result TEXT, error TEXT, trace_id TEXT, created_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events (job_id TEXT NOT NULL, id INTEGER NOT NULL, "
+                "type TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (job_id, id))"
+            )
+
+    def save(self, job):
+        """
+        Writes the job's current status, timings and (once finished) result or error.
+        """
+        with sqlite_connection(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, kind, owner, status, result, error, trace_id, created_at, started_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.owner, job.status, json.dumps(job.result), job.error, job.trace_id,
+                 job.created_at, job.started_at, job.finished_at),
+            )
+
+    def append_events(self, job_id, events):
+        with sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO job_events (job_id, id, type, data) VALUES (?, ?, ?, ?)",
+                [(job_id, event['id'], event['type'], json.dumps(event['data'])) for event in events],
+            )
+
+    def load(self, job_id):
+        """
+        Returns the stored job as a StoredJob, or None if it is unknown (or already pruned).
+        """
+        with sqlite_connection(self.path, rows=True) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return StoredJob(dict(row), self) if row else None
+
+    def events(self, job_id, after):
+        with sqlite_connection(self.path) as conn:
+            rows = conn.execute("SELECT id, type, data FROM job_events WHERE job_id = ? AND id >= ? ORDER BY id", (job_id, after)).fetchall()
+        return [{'id': event_id, 'type': event_type, 'data': json.loads(data)} for event_id, event_type, data in rows]
+
+    def final_status(self, job_id):
+        """
+        Returns 'succeeded' or 'failed' once the job's final status event is stored, else None.
+        """
+        with sqlite_connection(self.path) as conn:
+            row = conn.execute(
+                "SELECT json_extract(data, '$.status') FROM job_events WHERE job_id = ? AND type = 'status' "
+                "AND json_extract(data, '$.status') IN ('succeeded', 'failed')", (job_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def prune(self, cutoff):
+        # Drop finished jobs, and their events, that have been kept longer than the retention window.
+        with sqlite_connection(self.path) as conn:
+            conn.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,))
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+# --- Job Model ---
+
+class QueueFullError(Exception):
+    """
+    Raised when the job queue is at capacity and cannot accept more work.
+    """
+
+class Job:
+    """
+    One queued pipeline stage: its status, timings, and eventual result or error.
+    """
+    def __init__(self, kind, owner, store=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner # Session id of the user who submitted the job.
+        self.status = 'queued' # queued -> running -> succeeded | failed
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.trace_id = None # Set when the job starts; its spans can be fetched from /traces.
+        self.events = []
+        self.store = store # Shared JobStore the job is written through to, if any.
+        self._unsaved = 0 # Events at the end of `events` not yet written to the store.
+        self._last_flush = time.monotonic()
+        self._changed = threading.Condition(threading.RLock())
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed')
+
+    def emit(self, event_type, **data):
+        """
+        Appends an event to the job's stream and wakes any listeners.
+        """
+        with self._changed:
+            if event_type == 'token' and len(self.events) >= MAX_JOB_EVENTS:
+                return
+            self.events.append({'id': len(self.events), 'type': event_type, 'data': data})
+            self._unsaved += 1
+            if event_type != 'token' or self._unsaved >= TOKEN_FLUSH_SIZE or time.monotonic() - self._last_flush >= TOKEN_FLUSH_SECONDS:
+                self.flush_events()
+            self._changed.notify_all()
+
+    def flush_events(self):
+        """
+        Writes the events not yet in the store, in order. If the write fails they stay
+        pending and are retried with the next flush; local listeners are served either way.
+        """
+        with self._changed:
+            self._last_flush = time.monotonic()
+            if self.store is not None and self._unsaved:
+                try:
+                    self.store.append_events(self.id, self.events[-self._unsaved:])
+                except Exception as e:
+                    print(f"⚠️ Could not store events of job {self.id}: {e}")
+                    return
+            self._unsaved = 0
+
+    def finish(self, status):
+        """
+        Marks the job finished and emits its final status event in one step, so a listener
+        that sees the job as done is guaranteed to find that event in the stream.
+        """
+        with self._changed:
+            self.finished_at = time.time()
+            self.status = status
+            # The result is stored before the final event, so a worker that sees that event can collect it.
+            # A failed write must not keep this worker's own listeners waiting, so the event is emitted regardless.
+            if self.store is not None:
+                try:
+                    self.store.save(self)
+                except Exception as e:
+                    print(f"⚠️ Could not store the final state of job {self.id}: {e}")
+            self.emit('status', status=status, timings=self.timings())
+
+    def wait_for_events(self, after, timeout):
+        """
+        Returns the events with an id of `after` or higher, waiting up to `timeout` seconds for one
+        to arrive. Returns None if the job has finished and there are none: the stream is over.
+        """
+        with self._changed:
+            if len(self.events) <= after and not self.done:
+                self._changed.wait(timeout)
+            if len(self.events) <= after and self.done:
+                return None
+            return self.events[after:]
+
+    def timings(self):
+        """
+        Returns seconds spent waiting in the queue, running, and in total (so far, if unfinished).
+        """
+        now = time.time()
+        started = self.started_at or now
+        finished = self.finished_at or now
+        return {
+            'queued_seconds': round(started - self.created_at, 3),
+            'run_seconds': round(finished - started, 3) if self.started_at else 0.0,
+            'total_seconds': round(finished - self.created_at, 3),
+        }
+
+    def to_dict(self):
+        """
+        Public status view of the job (without its result payload).
+        """
+        return {'job_id': self.id, 'kind': self.kind, 'status': self.status, 'timings': self.timings(), 'trace_id': self.trace_id}
+
+class StoredJob(Job):
+    """
+    A job read back from the JobStore, e.g. one running in another worker process.
+    Same interface as Job; new events are picked up by polling the store.
+    """
+    def __init__(self, row, store):
+        self.id = row['id']
+        self.kind = row['kind']
+        self.owner = row['owner']
+        self.status = row['status']
+        self.result = json.loads(row['result']) if row['result'] else None
+        self.error = row['error']
+        self.trace_id = row['trace_id']
+        self.created_at = row['created_at']
+        self.started_at = row['started_at']
+        self.finished_at = row['finished_at']
+        self.store = store
+
+    def emit(self, event_type, **data):
+        raise RuntimeError("Only the worker running a job can emit its events.")
+
+    def wait_for_events(self, after, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.store.events(self.id, after)
+            if events:
+                return events
+            # The stored status turns final just before the final event is written, so the
+            # stream is only over once that event itself is in the store.
+            if self.store.final_status(self.id) is not None:
+                return None
+            if time.monotonic() >= deadline:
+                return events
+            time.sleep(STORE_POLL_SECONDS)
+
+def event_stream(job, cursor, keepalive):
+    """
+    Yields a job's events from id `cursor` on as Server-Sent Events, with a comment every
+    `keepalive` seconds while nothing happens. Ends after the final status event, or at once
+    if the client already has it (e.g. a reconnect with the final Last-Event-ID).
+    """
+    # The first bytes go out immediately so the client sees the stream open at once.
+    yield "retry: 3000\n\n"
+    while True:
+        events = job.wait_for_events(cursor, timeout=keepalive)
+        if events is None:
+            return
+        if not events:
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+            # The final status event is always the last one a finished job emits.
+            if event['type'] == 'status' and event['data']['status'] in ('succeeded', 'failed'):
+                return
+        cursor = events[-1]['id'] + 1
+
+# --- Job Manager ---
+
+class JobManager:
+    """
+    Runs pipeline stages on a bounded worker pool so Flask request threads return at once.
+
+    Jobs run in the process that accepted them, but with a shared `store` their status,
+    result and events are written through to it, so status, result and event requests can
+    land on any worker process. Finished jobs are kept for `retention` seconds so their
+    results can still be collected.
+    """
+    def __init__(self, max_workers=4, max_queue=64, retention=3600, store=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage-worker")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.stats_counters = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'rejected': 0}
+
+    def submit(self, kind, owner, fn, *args):
+        """
+        Queues `fn(*args)` as a new job and returns it immediately.
+        Raises QueueFullError if `max_queue` jobs are already waiting.
+        """
+        with self._lock:
+            self._prune()
+            if self._queue_depth() >= self.max_queue:
+                self.stats_counters['rejected'] += 1
+                raise QueueFullError(f"The job queue is full ({self.max_queue} waiting).")
+            job = Job(kind, owner, store=self.store)
+            self._jobs[job.id] = job
+            self.stats_counters['submitted'] += 1
+        if self.store is not None:
+            self.store.save(job)
+        job.emit('status', status=job.status)
+        self._pool.submit(self._run, job, fn, args)
+        print(f"📥 Queued {kind} job {job.id} (queue depth: {self.stats()['queue_depth']}).")
+        return job
+
+    def get(self, job_id):
+        """
+        Returns the job, from memory if this process runs it, else from the shared store.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        return job
+
+    def stats(self):
+        """
+        Reports queue depth, running jobs, and lifetime counters.
+        """
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == 'running')
+            return dict(self.stats_counters, queue_depth=self._queue_depth(), running=running, max_workers=self.max_workers)
+
+    def _run(self, job, fn, args):
+        job.status = 'running'
+        job.started_at = time.time()
+        if self.store is not None:
+            self.store.save(job)
+        job.emit('status', status=job.status)
+        JOB_QUEUE_SECONDS.observe(job.started_at - job.created_at, kind=job.kind)
+        token = current_job.set(job)
+        outcome = 'failed'
+        try:
+            # Each job is the root of its own trace: crews, LLM, tool and Notion calls nest under it.
+            with TRACER.span(f'stage.{job.kind}', kind='stage', job_id=job.id) as span:
+                job.trace_id = span.trace_id
+                if self.store is not None:
+                    self.store.save(job)
+                job.result = fn(*args)
+            outcome = 'succeeded'
+        except Exception as e:
+            print(f"❌ {job.kind} job {job.id} failed: {e}")
+            job.error = str(e)
+        finally:
+            current_job.reset(token)
+            job.finish(outcome)
+            with self._lock:
+                self.stats_counters[job.status] += 1
+            timings = job.timings()
+            print(f"⏱️ {job.kind} job {job.id} {job.status}: queued {timings['queued_seconds']:.1f}s, ran {timings['run_seconds']:.1f}s.")
+
+    def _queue_depth(self):
+        return sum(1 for job in self._jobs.values() if job.status == 'queued')
+
+    def _prune(self):
+        # Drop finished jobs whose results have been kept longer than the retention window.
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+        if self.store is not None:
+            self.store.prune(cutoff)
@@ -0,0 +1,147 @@
+# src/llm_stub.py
+
+# Standard library imports
+import hashlib # Derives stable fake answers from the prompt.
+import json # Builds the JSON answers the structured stages expect.
+import os # Reads the simulated latency and failure rate from environment variables.
+import random # Jitters latency and injects failures, reproducibly when seeded.
+import re # Finds the component name, tool observation and price in prompts.
+import threading # Guards the shared random generator.
+import time # Simulates model latency.
+
+# Parts the stub designer picks from; each project gets a stable subset based on its plan.
+STUB_PARTS = [
+    "Arduino Uno R3", "ESP32 DevKit V1", "DHT22 Sensor", "Soil Moisture Sensor", "5V Relay Module",
+    "Mini Submersible Pump", "16x2 LCD with I2C", "HC-SR04 Ultrasonic Sensor", "SG90 Servo Motor",
+    "L298N Motor Driver", "PIR Motion Sensor", "Piezo Buzzer", "BMP280 Sensor", "MQ-2 Gas Sensor",
+    "0.96 inch OLED Display", "DS3231 RTC Module", "Li-ion Battery Pack", "TP4056 Charger Module",
+]
+
+class StubRateLimitError(Exception):
+    """
+    An injected failure shaped like Gemini's 429, so RATE_LIMITER retries it like the real thing.
+    """
+
+def final_answer(text):
+    # The ReAct format CrewAI's agent executor parses.
+    return f"Thought: I now know the final answer\nFinal Answer: {text}"
+
+def digest(text):
+    return int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:8], 16)
+
+class StubResponder:
+    """
+    Offline stand-in for an LLM's `call`, selected with LLM_BACKEND=stub.
+
+    It recognizes each of the app's tasks from its prompt and answers in the format that
+    task asks for, so real CrewAI agents, the search tool (usually the stub Composio backend)
+    and the output parsers all run as they do in production. Latency and 429 failures are
+    simulated so benchmarks can measure the pipeline, not the model. `prefill` adds latency
+    per 1,000 prompt tokens, like a real model reading its prompt before the first token.
+    When `on_chunk` is set, the answer is streamed through it in two chunks: the first after
+    the prefill time plus a quarter of the base latency, the rest at the end.
+    """
+    def __init__(self, latency=None, jitter=None, failure_rate=None, seed=None, prefill=None):
+        self.latency = float(os.getenv("STUB_LLM_LATENCY_MS", "0")) / 1000 if latency is None else latency
+        self.prefill = float(os.getenv("STUB_LLM_PREFILL_MS_PER_1K", "0")) / 1000 if prefill is None else prefill
+        self.jitter = float(os.getenv("STUB_LLM_JITTER", "0.2")) if jitter is None else jitter
+        self.failure_rate = float(os.getenv("STUB_LLM_FAILURE_RATE", "0")) if failure_rate is None else failure_rate
+        seed = os.getenv("STUB_SEED") if seed is None else seed
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'failures': 0}
+        self.on_chunk = None
+
+    def call(self, messages, *args, **kwargs):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        # Rough token counts (about four characters per token).
+        prompt_tokens = sum(len(str(message.get('content', ''))) for message in messages) // 4
+        with self._lock:
+            self.stats['calls'] += 1
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.stats['failures'] += 1
+        first_token = max(0.0, delay) / 4 + self.prefill * prompt_tokens / 1000
+        time.sleep(first_token)
+        if fail:
+            raise StubRateLimitError("429 RESOURCE_EXHAUSTED: stub quota exceeded, retry in 0.1s")
+        answer = self.reply(messages)
+        if self.on_chunk is not None:
+            self.on_chunk(answer[:16], kwargs)
+        time.sleep(max(0.0, delay) * 3 / 4)
+        if self.on_chunk is not None and answer[16:]:
+            self.on_chunk(answer[16:], kwargs)
+        # Report usage the way CrewAI reports it for real models, so token accounting works offline too.
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(answer) // 4, 'total_tokens': prompt_tokens + len(answer) // 4}
+        for callback in kwargs.get('callbacks') or []:
+            if hasattr(callback, 'log_success_event'):
+                callback.log_success_event(kwargs={}, response_obj={'usage': usage}, start_time=0, end_time=0)
+        return answer
+
+    def reply(self, messages):
+        prompt = "\n".join(str(message.get('content', '')) for message in messages)
+        if "Some parts of a JSON document you produced are invalid" in prompt:
+            return "{}"
+        if "Analyze the user's request" in prompt:
+            return final_answer(
+                "**Description:**\n- A stub project plan.\n- Built from canned parts.\n\n<br><br>\n\n"
+                "**Process:**\n- Assemble the modules.\n- Flash the firmware.\n\n<br><br>\n\n**Budget:**\n- Around ₹3000."
+            )
+        if "Create a short, catchy name" in prompt:
+            return final_answer(f"Stub Project {digest(prompt) % 1000}")
+        if "create a conceptual list of components" in prompt:
+            seed = digest(prompt)
+            parts = [STUB_PARTS[(seed + i * 7) % len(STUB_PARTS)] for i in range(6)]
+            components = [{"name": name, "quantity": 1 + (seed >> i) % 2, "purpose": f"Stub purpose for {name}."} for i, name in enumerate(parts)]
+            return final_answer("```json\n" + json.dumps({"components": components}) + "\n```")
+        component = re.search(r"purchase link for ONE component:\s*'([^']+)'", prompt)
+        if component:
+            return self.source(component.group(1), messages)
+        if "Mermaid diagram generator" in prompt:
+            diagrams = {
+                "workflow_mermaid": "flowchart TD\n    A[Sense] --> B[Decide]\n    B --> C[Act]",
+                "architecture_mermaid": "flowchart LR\n    MCU[Controller] --> OUT[Actuator]\n    IN[Sensor] --> MCU",
+                "title_workflow": "Workflow Diagram",
+                "title_architecture": "Architecture Diagram",
+            }
+            return final_answer("```json\n" + json.dumps(diagrams) + "\n```")
+        if "Arduino sketch" in prompt:
+            return final_answer("```cpp\nvoid setup() {\n  Serial.begin(9600);\n}\n\nvoid loop() {\n}\n```")
+        return final_answer("OK")
+
+    def source(self, name, messages):
+        # First turn: search. Once the tool's observation is in the conversation, answer from it.
+        observation = next((m['content'] for m in reversed(messages) if m.get('role') == 'assistant' and 'Observation:' in str(m.get('content'))), None)
+        if observation is None:
+            return (
+                f"Thought: I should search for the price of {name}.\n"
+                f"Action: COMPOSIO_SEARCH_DUCK_DUCK_GO_SEARCH\n"
+                f"Action Input: {json.dumps({'query': f'{name} price India'})}"
+            )
+        price = re.search(r"Price: ₹(\d+)", observation)
+        link = re.search(r"https?://[^\s'\"]+", observation.split('Observation:', 1)[-1])
+        answer = {
+            "name": name,
+            "quantity": 1,
+            "price_inr": price.group(1) if price else "N/A",
+            "purchase_url": link.group(0).rstrip(',}') if link and price else "N/A",
+        }
+        return final_answer("```json\n" + json.dumps(answer) + "\n```")
+
+def install_stub(llm, responder=None):
+    """
+    Replaces `llm.call` with a StubResponder, keeping the LLM object (model name, settings)
+    so the rest of the app, including RATE_LIMITER, treats it as the real client. A streaming
+    LLM's stub emits CrewAI's stream chunk events, as the real client does.
+    """
+    responder = responder or StubResponder()
+    if llm.stream:
+        from crewai.events import crewai_event_bus, LLMStreamChunkEvent # CrewAI is loaded by now.
+        def emit_chunk(chunk, call_kwargs):
+            event = LLMStreamChunkEvent(chunk=chunk, from_task=call_kwargs.get('from_task'), from_agent=call_kwargs.get('from_agent'))
+            crewai_event_bus.emit(llm, event=event)
+        responder.on_chunk = emit_chunk
+    llm.call = responder.call
+    return llm
@@ -0,0 +1,135 @@
+# src/notion_writer.py
+
+# Standard library imports
+import contextvars # Carries the current job into writer threads so their progress reaches the user.
+import os # Reads writer settings from environment variables.
+import time # Times each page tree write.
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait # Runs independent Notion calls side by side.
+
+# Local application imports
+from src.observability import TRACER # Traces each Notion call.
+from src.tools.composio_tools import get_composio, MY_APP_USER_ID # Composio client used for the Notion calls.
+
+# Notion accepts at most 100 blocks per append request.
+NOTION_MAX_BLOCKS_PER_CALL = 100
+
+# --- Page Trees ---
+
+def page(title, blocks=None, children=None):
+    """
+    Describes a Notion page to write: its title, its content (a list of Markdown strings,
+    one per block), and its child pages. Plain dicts, so a tree can be stored as JSON.
+    """
+    return {'title': title, 'blocks': list(blocks or []), 'children': list(children or [])}
+
+def notion_execute(slug, arguments):
+    """
+    Runs one Notion action through Composio and returns its raw result dict.
+    """
+    with TRACER.span('notion.execute', kind='notion', action=slug) as span:
+        result = get_composio().tools.execute(user_id=MY_APP_USER_ID, slug=slug, arguments=arguments)
+        span.set(successful=bool(result.get("successful")))
+        return result
+
+# --- Notion Writer ---
+
+class NotionWriter:
+    """
+    Writes a tree of pages to Notion in as few sequential round trips as possible.
+
+    The tree is treated as a dependency graph: a page can be created as soon as its parent
+    exists, and its content can be appended as soon as the page itself exists. Every call
+    whose dependency is met is started right away, so sibling pages are created (and filled)
+    concurrently, and each page's content goes out in a single append call unless it exceeds
+    Notion's per-request block limit.
+    """
+    def __init__(self, execute, max_workers=4, max_blocks_per_call=NOTION_MAX_BLOCKS_PER_CALL):
+        self.execute = execute
+        self.max_workers = max_workers
+        self.max_blocks_per_call = max_blocks_per_call
+
+    def _create_page(self, parent_id, title):
+        result = self.execute("NOTION_CREATE_NOTION_PAGE", {"parent_id": parent_id, "title": title})
+        if not result.get("successful"):
+            raise Exception(f"Failed to create Notion page '{title}': {result.get('error')}")
+        return result['data']
+
+    def _append_blocks(self, page_id, title, blocks):
+        content_blocks = [{"content_block": {"content": block}} for block in blocks]
+        result = self.execute("NOTION_ADD_MULTIPLE_PAGE_CONTENT", {"parent_block_id": page_id, "content_blocks": content_blocks})
+        if not result.get("successful"):
+            raise Exception(f"Failed to add content to Notion page '{title}': {result.get('error')}")
+        return result
+
+    def write(self, root, parent_id, created=None):
+        """
+        Creates `root` (a `page(...)` tree) under `parent_id` and returns the created tree as
+        nested `{'title', 'id', 'url', 'children'}` dicts, in the same order as the input.
+
+        `created` is filled in place as calls succeed. Passing back the partial record from a
+        failed attempt resumes it: pages that already exist and content chunks already
+        appended are skipped, so a retry never duplicates them. Raises on the first failed
+        call, after the calls already in flight have finished.
+        """
+        start = time.perf_counter()
+        created = created if created is not None else {}
+        calls = 0
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="notion-writer")
+        pending = {}
+        errors = []
+
+        def submit(fn, *args, on_done=None):
+            if errors:
+                return # Stop starting new calls once one has failed.
+            # Each call runs in a copy of the caller's context, like the crews in executor.py.
+            future = pool.submit(contextvars.copy_context().run, fn, *args)
+            pending[future] = on_done
+
+        def visit(node, record, parent_id):
+            record.setdefault('title', node['title'])
+            record.setdefault('children', [])
+            record.setdefault('chunks_written', [])
+            if record.get('id'):
+                page_ready(node, record)
+            else:
+                submit(self._create_page, parent_id, node['title'], on_done=lambda data: page_ready(node, record, data))
+
+        def page_ready(node, record, data=None):
+            if data is not None:
+                record.update(id=data['id'], url=data.get('url'))
+            blocks = node['blocks']
+            for index, offset in enumerate(range(0, len(blocks), self.max_blocks_per_call)):
+                if index not in record['chunks_written']:
+                    submit(self._append_blocks, record['id'], node['title'], blocks[offset:offset + self.max_blocks_per_call],
+                           on_done=lambda _, index=index: record['chunks_written'].append(index))
+            for position, child in enumerate(node['children']):
+                if position == len(record['children']):
+                    record['children'].append({})
+                visit(child, record['children'][position], record['id'])
+
+        try:
+            visit(root, created, parent_id)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    on_done = pending.pop(future)
+                    calls += 1
+                    # Calls already in flight are still recorded after a failure, so a retry skips them.
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    if on_done is not None:
+                        on_done(result)
+        finally:
+            # Never leave a Notion call running in the background, even on failure.
+            pool.shutdown(wait=True)
+        if errors:
+            raise errors[0]
+
+        print(f"⏱️ Notion: wrote '{root['title']}' with {calls} calls in {time.perf_counter() - start:.1f}s.")
+        return created
+
+# Process-wide writer; Composio's client keeps its HTTP connections pooled across calls.
+NOTION_WRITER = NotionWriter(notion_execute, max_workers=int(os.getenv("NOTION_WRITER_WORKERS", "4")))
@@ -0,0 +1,358 @@
+# src/observability.py
+
+# Standard library imports
+import contextvars # Tracks the active span, so nested and cross-thread work joins the right trace.
+import json # Encodes spans for the OTLP/HTTP exporter.
+import os # Reads tracing settings from environment variables.
+import secrets # Generates trace and span ids.
+import threading # Guards the metrics and span buffer; runs the OTLP exporter.
+import time # Timestamps spans.
+import urllib.request # Posts span batches to an OTLP/HTTP collector.
+from collections import deque # Bounded buffer of recently finished spans.
+from contextlib import contextmanager # The `span(...)` context manager.
+
+# Local application imports
+from src.rate_limiter import is_rate_limit_error # Labels throttled LLM calls.
+
+# Latency buckets in seconds, from a cache hit to a long agent run.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+# --- Metrics ---
+
+class Counter:
+    """
+    A monotonically increasing value per label set.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count per label set, as Prometheus expects.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                labels = dict(key)
+                for bound, count in zip(self.buckets, series['buckets']):
+                    samples.append((f"{self.name}_bucket", dict(labels, le=f"{bound:g}"), count))
+                samples.append((f"{self.name}_bucket", dict(labels, le="+Inf"), series['count']))
+                samples.append((f"{self.name}_sum", labels, series['sum']))
+                samples.append((f"{self.name}_count", labels, series['count']))
+        return samples
+
+class MetricsRegistry:
+    """
+    Holds the app's counters and histograms and renders them, together with values read
+    from the existing stats (caches, rate limiter, queues) at scrape time, in the
+    Prometheus text exposition format.
+    """
+    def __init__(self, prefix="buddy_"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(self.prefix + name, help_text, **kwargs)
+            return self._metrics[name]
+
+    def get(self, name):
+        """
+        Returns the counter or histogram registered as `name`, or None.
+        """
+        with self._lock:
+            return self._metrics.get(name)
+
+    def counter(self, name, help_text):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def register_collector(self, collector):
+        """
+        Registers `collector()`, called on every scrape. It returns a list of
+        `(name, kind, help, [(labels, value), ...])` tuples, with `kind` 'counter' or 'gauge'.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+            lines += [f"{name}{format_labels(labels)} {value:g}" for name, labels, value in metric.samples()]
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                name = self.prefix + name
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{format_labels(labels)} {float(value):g}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+# --- Tracing ---
+
+class Span:
+    """
+    One timed operation. `attributes` hold what is useful when reading a trace (stage,
+    model, token counts, tool slug, cache hits); prompts and outputs are never recorded.
+    """
+    def __init__(self, name, kind, parent=None, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        # The pipeline stage (design, sourcing, ...) this span belongs to, inherited from its parent.
+        self.stage = self.attributes.get('stage', parent.stage if parent else None)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self):
+        """
+        Encodes the span in the OTLP/JSON span format.
+        """
+        def value(v):
+            if isinstance(v, bool):
+                return {'boolValue': v}
+            if isinstance(v, int):
+                return {'intValue': str(v)}
+            if isinstance(v, float):
+                return {'doubleValue': v}
+            return {'stringValue': str(v)}
+        encoded = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1, # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or time.time_ns()),
+            'attributes': [{'key': key, 'value': value(v)} for key, v in dict(self.attributes, **{'span.kind': self.kind}).items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            encoded['parentSpanId'] = self.parent_id
+        return encoded
+
+# The span active in the current context; copied into worker threads with the rest of the context.
+current_span = contextvars.ContextVar('current_span', default=None)
+
+class OTLPExporter:
+    """
+    Posts finished spans in batches to an OpenTelemetry collector's OTLP/HTTP JSON endpoint
+    (e.g. http://localhost:4318/v1/traces) from a background thread. Spans are dropped,
+    never blocked on, when the collector is slow or down.
+    """
+    def __init__(self, endpoint, service_name, interval=5.0, max_queue=10000):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.interval = interval
+        self._queue = deque(maxlen=max_queue)
+        self._thread = threading.Thread(target=self._work, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        self._queue.append(span)
+
+    def _work(self):
+        while True:
+            time.sleep(self.interval)
+            batch = []
+            while self._queue:
+                batch.append(self._queue.popleft())
+            if not batch:
+                continue
+            body = json.dumps(otlp_payload(batch, self.service_name)).encode('utf-8')
+            request = urllib.request.Request(self.endpoint, data=body, headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except Exception as e:
+                print(f"⚠️ Could not export {len(batch)} spans to {self.endpoint}: {e}")
+
+def otlp_payload(spans, service_name):
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+        'scopeSpans': [{'scope': {'name': 'src.observability'}, 'spans': [span.to_otlp() for span in spans]}],
+    }]}
+
+class Tracer:
+    """
+    Records spans around the app's hot paths: stage jobs, crew kickoffs, LLM calls, search
+    tool calls and Notion calls.
+
+    Every finished span is kept in a bounded in-process buffer (served as OTLP/JSON by the
+    /traces endpoint), feeds the `span_duration_seconds` histogram behind /metrics, and is
+    handed to any extra exporters, such as OTLPExporter.
+    """
+    def __init__(self, metrics, service_name="build-with-me-buddy", max_spans=2000):
+        self.service_name = service_name
+        self.exporters = []
+        self._finished = deque(maxlen=max_spans)
+        self._durations = metrics.histogram('span_duration_seconds', "Duration of traced operations, by kind and name.")
+        self._errors = metrics.counter('span_errors_total', "Traced operations that raised, by kind and name.")
+
+    @contextmanager
+    def span(self, name, kind='internal', **attributes):
+        """
+        Times the enclosed block as a child of the current span (or as a new trace).
+        Yields the Span, so the block can add attributes as it learns them.
+        """
+        span = Span(name, kind, parent=current_span.get(), attributes=attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current_span.reset(token)
+            self.finish(span)
+
+    def finish(self, span):
+        span.end_ns = time.time_ns()
+        self._finished.append(span)
+        self._durations.observe(span.duration, kind=span.kind, name=span.name)
+        if span.error:
+            self._errors.inc(kind=span.kind, name=span.name)
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def export(self, limit=None, trace_id=None):
+        """
+        Returns recently finished spans (newest last) as an OTLP/JSON traces payload.
+        """
+        spans = [span for span in list(self._finished) if trace_id is None or span.trace_id == trace_id]
+        return otlp_payload(spans[-limit:] if limit else spans, self.service_name)
+
+# --- LLM Instrumentation ---
+
+def usage_value(usage, field):
+    # LiteLLM reports usage as an object, or as a dict in streamed chunks.
+    value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+    return value if isinstance(value, int) else 0
+
+def instrument_llm(llm, tracer, metrics):
+    """
+    Wraps `llm.call` in an `llm.call` span that records the model, outcome and token counts,
+    and counts calls and tokens per model. Install it beneath RATE_LIMITER, so each span
+    times one request to the model and waiting for the rate limit is not counted as model time.
+    """
+    from litellm.integrations.custom_logger import CustomLogger # LiteLLM is already loaded with CrewAI.
+    calls = metrics.counter('llm_calls_total', "LLM requests, by model and outcome.")
+    tokens = metrics.counter('llm_tokens_total', "LLM tokens, by model, stage and type (prompt or completion).")
+    latency = metrics.histogram('llm_call_seconds', "Duration of successful LLM requests, by model and stage.")
+    original_call = llm.call
+
+    class UsageRecorder(CustomLogger):
+        # CrewAI hands each callback the response's usage on the calling thread; LiteLLM may
+        # also invoke registered callbacks from its own threads, which are ignored here.
+        def __init__(self):
+            super().__init__()
+            self.thread = threading.get_ident()
+            self.usage = None
+
+        def log_success_event(self, kwargs, response_obj, start_time, end_time):
+            if self.usage is None and threading.get_ident() == self.thread and isinstance(response_obj, dict):
+                self.usage = response_obj.get('usage')
+
+    def instrumented_call(messages, *args, callbacks=None, **kwargs):
+        recorder = UsageRecorder()
+        with tracer.span('llm.call', kind='llm', model=llm.model) as span:
+            stage = span.stage or 'other'
+            span.set(stage=stage)
+            try:
+                result = original_call(messages, *args, callbacks=list(callbacks or []) + [recorder], **kwargs)
+            except Exception as e:
+                outcome = 'rate_limited' if is_rate_limit_error(e) else 'error'
+                calls.inc(model=llm.model, outcome=outcome)
+                span.set(outcome=outcome)
+                raise
+            calls.inc(model=llm.model, outcome='ok')
+            latency.observe(span.duration, model=llm.model, stage=stage)
+            span.set(outcome='ok')
+            if recorder.usage is not None:
+                prompt, completion = usage_value(recorder.usage, 'prompt_tokens'), usage_value(recorder.usage, 'completion_tokens')
+                span.set(prompt_tokens=prompt, completion_tokens=completion)
+                tokens.inc(prompt, model=llm.model, stage=stage, type='prompt')
+                tokens.inc(completion, model=llm.model, stage=stage, type='completion')
+            return result
+
+    llm.call = instrumented_call
+    return llm
+
+# Process-wide metrics and tracer. Set OTEL_EXPORTER_OTLP_TRACES_ENDPOINT to also push
+# spans to an OpenTelemetry collector; TRACE_BUFFER_SIZE bounds the spans kept for /traces.
+METRICS = MetricsRegistry()
+TRACER = Tracer(METRICS, service_name=os.getenv("OTEL_SERVICE_NAME", "build-with-me-buddy"), max_spans=int(os.getenv("TRACE_BUFFER_SIZE", "2000")))
+if os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"):
+    TRACER.exporters.append(OTLPExporter(os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"), TRACER.service_name))
+
+LLM_TIME_TO_FIRST_TOKEN = METRICS.histogram('llm_time_to_first_token_seconds', "Time from the start of a streamed LLM request to its first chunk, by stage.")
+
+def record_stream_chunk():
+    """
+    Called for every streamed LLM chunk, on the thread that made the request. The first chunk
+    of each `llm.call` span sets its `time_to_first_token` and feeds the TTFT histogram.
+    """
+    span = current_span.get()
+    if span is None or span.kind != 'llm' or 'time_to_first_token' in span.attributes:
+        return
+    span.set(time_to_first_token=span.duration)
+    LLM_TIME_TO_FIRST_TOKEN.observe(span.duration, stage=span.attributes.get('stage', 'other'))
@@ -0,0 +1,223 @@
+# src/outbox.py
+
+# Standard library imports
+import json # Serializes page trees and their partial write progress.
+import os # Reads outbox settings from environment variables.
+import threading # Runs the background publisher.
+import time # Schedules retries and leases.
+import uuid # Generates outbox entry ids.
+
+# Local application imports
+from src.cache import data_path, sqlite_connection # Shared SQLite connection helper and data file location.
+from src.notion_writer import NOTION_WRITER # Performs the actual Notion calls.
+from src.observability import TRACER # Traces each publish attempt.
+
+# --- Notion Outbox ---
+
+class NotionOutbox:
+    """
+    A durable queue of Notion page trees waiting to be published.
+
+    Stages enqueue what they want written and return to the user at once; a background
+    worker publishes each entry with NotionWriter, retrying failures with exponential backoff.
+    Partial progress is saved after every attempt, so a retry only makes the calls that
+    have not succeeded yet. An entry may name another entry as its parent (e.g. the Stage 3
+    guide page under the Stage 2 project page); it is published once that parent exists.
+    """
+    def __init__(self, path, writer, max_attempts=8, retry_base=2.0, retry_max=300.0, lease=600.0, retention=7 * 86400):
+        self.path = path
+        self.writer = writer
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease # An entry claimed longer ago than this (e.g. by a crashed worker) is retried.
+        self.retention = retention
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        with sqlite_connection(self.path, rows=True) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS notion_outbox ("
+                "id TEXT PRIMARY KEY, session_id TEXT NOT NULL, tree TEXT NOT NULL, "
+                "parent_id TEXT, parent_entry TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL, lease_until REAL, progress TEXT, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS notion_outbox_due ON notion_outbox (status, next_attempt_at)")
+
+    def enqueue(self, session_id, tree, parent_id=None, parent_entry=None):
+        """
+        Queues a `page(...)` tree to be written under `parent_id`, or under the root page of
+        the outbox entry `parent_entry`. Returns the new entry's id.
+        """
+        entry_id = uuid.uuid4().hex
+        now = time.time()
+        with sqlite_connection(self.path, rows=True) as conn:
+            conn.execute(
+                "INSERT INTO notion_outbox (id, session_id, tree, parent_id, parent_entry, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?, ?)",
+                (entry_id, session_id, json.dumps(tree), parent_id, parent_entry, now, now, now),
+            )
+        self.start()
+        self._wake.set()
+        return entry_id
+
+    def status(self, entry_id):
+        """
+        Returns `{'entry_id', 'session_id', 'status', 'title', 'url', 'attempts', 'error'}`
+        for an entry, or None if it does not exist. Status is pending, sending, done or failed.
+        """
+        with sqlite_connection(self.path, rows=True) as conn:
+            row = conn.execute("SELECT * FROM notion_outbox WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        progress = json.loads(row['progress'] or '{}')
+        return {
+            'entry_id': row['id'],
+            'session_id': row['session_id'],
+            'status': row['status'],
+            'title': json.loads(row['tree'])['title'],
+            'url': progress.get('url') if row['status'] == 'done' else None,
+            'attempts': row['attempts'],
+            'error': row['error'],
+        }
+
+    def stats(self):
+        """
+        Counts entries by status.
+        """
+        with sqlite_connection(self.path, rows=True) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM notion_outbox GROUP BY status").fetchall()
+        return {'pending': 0, 'sending': 0, 'done': 0, 'failed': 0, **dict(rows)}
+
+    # --- Background Worker ---
+
+    def start(self):
+        """
+        Starts the background publisher thread (once per process).
+        """
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._work, name="notion-outbox", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=30):
+        """
+        Stops the publisher thread once the entry it is publishing (if any) is done. Entries
+        still queued stay in the outbox and are published after the next `start()`.
+        """
+        with self._start_lock:
+            thread = self._thread
+            self._stopping.set()
+            self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            self._wake.clear()
+            try:
+                published = self.process_due()
+            except Exception as e:
+                print(f"❌ Notion outbox worker error: {e}")
+                published = 0
+            if not published:
+                # Nothing was ready: sleep until new work is queued or a retry may be due.
+                self._wake.wait(timeout=self.retry_base)
+
+    def process_due(self):
+        """
+        Publishes every entry that is due and whose parent page exists. Returns how many were attempted.
+        """
+        now = time.time()
+        with sqlite_connection(self.path, rows=True) as conn:
+            conn.execute("DELETE FROM notion_outbox WHERE status IN ('done', 'failed') AND updated_at < ?", (now - self.retention,))
+            candidates = conn.execute(
+                "SELECT id FROM notion_outbox WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                "OR (status = 'sending' AND lease_until < ?) ORDER BY created_at",
+                (now, now),
+            ).fetchall()
+        attempted = 0
+        for candidate in candidates:
+            if self._stopping.is_set():
+                break
+            entry = self._claim(candidate['id'])
+            if entry is not None:
+                attempted += self._publish(entry)
+        return attempted
+
+    def _claim(self, entry_id):
+        # Only one worker (thread or process) wins the conditional update for a given entry.
+        now = time.time()
+        with sqlite_connection(self.path, rows=True) as conn:
+            claimed = conn.execute(
+                "UPDATE notion_outbox SET status = 'sending', lease_until = ?, updated_at = ? "
+                "WHERE id = ? AND ((status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND lease_until < ?))",
+                (now + self.lease, now, entry_id, now, now),
+            ).rowcount
+            if not claimed:
+                return None
+            return conn.execute("SELECT * FROM notion_outbox WHERE id = ?", (entry_id,)).fetchone()
+
+    def _resolve_parent(self, entry):
+        """
+        Returns `(parent_id, error)`: the page to write under, or None if the parent entry is not published yet.
+        """
+        if not entry['parent_entry']:
+            return entry['parent_id'], None
+        parent = self.status(entry['parent_entry'])
+        if parent is None or parent['status'] == 'failed':
+            return None, "Its parent Notion page could not be published."
+        if parent['status'] != 'done':
+            return None, None
+        with sqlite_connection(self.path, rows=True) as conn:
+            progress = conn.execute("SELECT progress FROM notion_outbox WHERE id = ?", (entry['parent_entry'],)).fetchone()[0]
+        return json.loads(progress)['id'], None
+
+    def _publish(self, entry):
+        parent_id, parent_error = self._resolve_parent(entry)
+        if parent_id is None:
+            if parent_error:
+                self._finish(entry['id'], 'failed', entry['progress'], parent_error, entry['attempts'])
+                return 1
+            # Parent still pending: hand the entry back without spending an attempt.
+            self._finish(entry['id'], 'pending', entry['progress'], None, entry['attempts'], retry_in=self.retry_base)
+            return 0
+
+        tree = json.loads(entry['tree'])
+        progress = json.loads(entry['progress'] or '{}')
+        attempts = entry['attempts'] + 1
+        try:
+            with TRACER.span('notion.publish', kind='notion', entry_id=entry['id'], attempt=attempts):
+                self.writer.write(tree, parent_id, created=progress)
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                print(f"❌ Giving up on Notion page '{tree['title']}' after {attempts} attempts: {e}")
+                self._finish(entry['id'], 'failed', json.dumps(progress), str(e), attempts)
+            else:
+                retry_in = min(self.retry_max, self.retry_base * 2 ** attempts)
+                print(f"⏳ Notion page '{tree['title']}' failed ({e}); retrying in {retry_in:.0f}s.")
+                self._finish(entry['id'], 'pending', json.dumps(progress), str(e), attempts, retry_in=retry_in)
+            return 1
+        print(f"✅ Published Notion page '{tree['title']}'.")
+        self._finish(entry['id'], 'done', json.dumps(progress), None, attempts)
+        return 1
+
+    def _finish(self, entry_id, status, progress, error, attempts, retry_in=0.0):
+        now = time.time()
+        with sqlite_connection(self.path, rows=True) as conn:
+            conn.execute(
+                "UPDATE notion_outbox SET status = ?, progress = ?, error = ?, attempts = ?, "
+                "next_attempt_at = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (status, progress, error, attempts, now + retry_in, now, entry_id),
+            )
+
+# Process-wide outbox; point NOTION_OUTBOX_DB at shared storage when running several workers.
+NOTION_OUTBOX = NotionOutbox(
+    os.getenv("NOTION_OUTBOX_DB", data_path("notion_outbox.sqlite3")),
+    NOTION_WRITER,
+    max_attempts=int(os.getenv("NOTION_OUTBOX_MAX_ATTEMPTS", "8")),
+)
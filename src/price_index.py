@@ -0,0 +1,103 @@
+# src/price_index.py
+
+# Standard library imports
+import os # Reads the index location and staleness window from environment variables.
+import threading # Serializes writes from concurrent requests.
+import time # Timestamps entries for staleness checks.
+
+# Local application imports
+from src.cache import data_path, sqlite_connection # Shared SQLite connection helper and data file location.
+from src.bom_table import normalize_component_name, row_value, to_final_bom_row # Shared BOM table helpers.
+
+# --- Component Price Index ---
+
+class PriceIndex:
+    """
+    A local index of component prices and purchase URLs, keyed by normalized component name.
+
+    It is filled from past sourcing results and checked before the parts_sourcer agent runs,
+    so only components that are unknown (or whose entry has gone stale) are searched again.
+    """
+    def __init__(self, path, max_age=7 * 24 * 3600):
+        """
+        `max_age` is how many seconds an entry stays fresh; stale entries count as misses
+        and are overwritten by the next sourcing run, which is how the index refreshes.
+        """
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'recorded': 0}
+        with sqlite_connection(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS components ("
+                "name_key TEXT PRIMARY KEY, component_name TEXT NOT NULL, price TEXT NOT NULL, "
+                "url TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def lookup(self, component_name):
+        """
+        Returns `{'component_name', 'price', 'url'}` for a fresh entry, or None on a miss.
+        """
+        key = normalize_component_name(component_name)
+        with sqlite_connection(self.path) as conn:
+            row = conn.execute("SELECT component_name, price, url, updated_at FROM components WHERE name_key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        if time.time() - row[3] > self.max_age:
+            self.stats['stale'] += 1
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return {'component_name': row[0], 'price': row[1], 'url': row[2]}
+
+    def record(self, component_name, price, url):
+        """
+        Adds or refreshes an entry. Rows without a usable price are skipped so they are retried later.
+        """
+        key = normalize_component_name(component_name)
+        if not key or not price or price.strip().upper() in ('N/A', 'NA', '-'):
+            return False
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO components (name_key, component_name, price, url, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, component_name.strip(), price.strip(), '' if url in (None, 'N/A') else url.strip(), time.time()),
+            )
+        self.stats['recorded'] += 1
+        return True
+
+    def record_rows(self, rows):
+        """
+        Records every row of a parsed final BOM table; returns how many entries were written.
+        """
+        final_rows = [to_final_bom_row(row) for row in rows]
+        return sum(self.record(row['Component Name'], row['Price (INR)'], row['Purchase URL']) for row in final_rows)
+
+    def partition(self, conceptual_rows):
+        """
+        Splits conceptual BOM rows, given as a dict keyed by their position in the BOM, into
+        `(known, missing)` dicts with the same keys.
+
+        `known` rows are already in final-BOM form (see bom_table.FINAL_BOM_COLUMNS) and need no search;
+        `missing` rows are returned unchanged for the sourcing crew.
+        """
+        known, missing = {}, {}
+        for position, row in conceptual_rows.items():
+            name = row_value(row, 'component', 'name')
+            entry = self.lookup(name) if name else None
+            if entry is None:
+                missing[position] = row
+                continue
+            known[position] = {
+                'Component Name': name,
+                'Quantity': row_value(row, 'quantity', 'qty', default='1'),
+                'Price (INR)': entry['price'],
+                'Purchase URL': entry['url'] or 'N/A',
+            }
+        return known, missing
+
+# Process-wide index; point PRICE_INDEX_DB elsewhere to share it between deployments.
+PRICE_INDEX = PriceIndex(
+    os.getenv("PRICE_INDEX_DB", data_path("price_index.sqlite3")),
+    max_age=float(os.getenv("PRICE_INDEX_MAX_AGE_DAYS", "7")) * 24 * 3600,
+)
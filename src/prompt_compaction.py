@@ -0,0 +1,96 @@
+# src/prompt_compaction.py
+
+# Standard library imports
+import os # Reads the compaction switch and token budget from environment variables.
+import re # Strips markdown and HTML from stage outputs.
+
+# Local application imports
+from src.bom_table import normalize_component_name, parse_markdown_table, row_value # Reads the BOM tables.
+from src.observability import METRICS # Counts prompt input tokens before and after compaction.
+
+# Set PROMPT_COMPACTION=0 to pass earlier stage outputs to later crews verbatim.
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1").lower() not in ("0", "false")
+
+# Upper bound, in estimated tokens, for any one compacted input; longer inputs are cut at a line break.
+PROMPT_INPUT_TOKEN_BUDGET = int(os.getenv("PROMPT_INPUT_TOKEN_BUDGET", "1500"))
+
+PROMPT_INPUT_TOKENS = METRICS.counter('prompt_input_tokens_total', "Estimated tokens of earlier stage outputs filled into prompts, by stage, input and form (raw or sent).")
+
+def estimate_tokens(text):
+    """
+    Rough token count (about four characters per token), good enough for budgeting.
+    """
+    return (len(text) + 3) // 4
+
+# --- Canonical Forms ---
+
+def compact_plan(project_plan, sections=None):
+    """
+    Reduces the Stage 1 plan to plain 'Section:' lines and '- ' bullets, dropping the bold
+    markers, <br> spacing and blank lines it is written with for display. If `sections` is
+    given, only those sections (e.g. ('Description', 'Process')) are kept.
+    """
+    lines, keep = [], True
+    for line in re.sub(r"<br\s*/?>", "\n", project_plan, flags=re.IGNORECASE).splitlines():
+        line = " ".join(re.sub(r"[*_`#]", "", line).split())
+        if not line:
+            continue
+        heading = re.fullmatch(r"([A-Za-z &]+):", line)
+        if heading:
+            keep = sections is None or heading.group(1) in sections
+        if keep:
+            lines.append(line)
+    return "\n".join(lines)
+
+def compact_bom(bom_table, conceptual_bom_table=None):
+    """
+    Reduces a BOM markdown table to one '- <qty> x <name>' line per component, without row
+    numbers, prices or purchase URLs. Each component's purpose is appended from the
+    conceptual BOM when it is given, since that is what the diagram and code crews need.
+    """
+    purposes = {}
+    for row in parse_markdown_table(conceptual_bom_table or ""):
+        purposes[normalize_component_name(row_value(row, 'component', 'name'))] = row_value(row, 'purpose', 'description')
+    lines = []
+    for row in parse_markdown_table(bom_table):
+        name = re.sub(r"[*_`]", "", row_value(row, 'component', 'name')).strip()
+        if not name:
+            continue
+        line = f"- {row_value(row, 'quantity', 'qty', default='1') or '1'} x {name}"
+        purpose = purposes.get(normalize_component_name(name))
+        lines.append(f"{line}: {purpose}" if purpose else line)
+    # Fall back to the raw text if it was not a table after all.
+    return "\n".join(lines) or bom_table.strip()
+
+def fit_budget(text, max_tokens):
+    """
+    Cuts `text` at the last line break that keeps it within `max_tokens`.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept, used = [], 0
+    for line in text.splitlines():
+        used += estimate_tokens(line + "\n")
+        if used > max_tokens:
+            break
+        kept.append(line)
+    return "\n".join(kept + ["(truncated)"])
+
+# --- Stage Inputs ---
+
+def compact_inputs(stage, raw_inputs, compactors):
+    """
+    Builds a crew's inputs from earlier stage outputs. `compactors` maps each input name to a
+    function returning its canonical form; inputs without one are passed through. Raw and
+    sent token estimates are counted per stage and input, so the savings show on /metrics.
+    """
+    inputs = {}
+    for name, value in raw_inputs.items():
+        compactor = compactors.get(name)
+        if PROMPT_COMPACTION and compactor is not None:
+            inputs[name] = fit_budget(compactor(value), PROMPT_INPUT_TOKEN_BUDGET)
+        else:
+            inputs[name] = value
+        PROMPT_INPUT_TOKENS.inc(estimate_tokens(str(value)), stage=stage, input=name, form='raw')
+        PROMPT_INPUT_TOKENS.inc(estimate_tokens(str(inputs[name])), stage=stage, input=name, form='sent')
+    return inputs
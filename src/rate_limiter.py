@@ -0,0 +1,207 @@
+# src/rate_limiter.py
+
+# Standard library imports
+import contextvars # Carries the priority lane of the stage currently running on this thread.
+import os # Reads per-model request budgets from environment variables.
+import random # Adds jitter to retry backoff so throttled calls do not retry in lockstep.
+import re # Extracts the server's suggested retry delay from 429 error messages.
+import threading # Coordinates callers waiting on a shared bucket.
+import time # Drives token refill and backoff timing.
+from contextlib import contextmanager # Provides the `priority_lane(...)` context manager.
+
+# --- Priority Lanes ---
+
+# Interactive calls (planning, naming, design, final assets) always go ahead of bulk ones (sourcing).
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+current_lane = contextvars.ContextVar('current_lane', default=INTERACTIVE)
+
+@contextmanager
+def priority_lane(lane):
+    """
+    Runs the enclosed LLM calls in the given lane (INTERACTIVE or BULK).
+    """
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+# --- Adaptive Token Bucket ---
+
+class AdaptiveTokenBucket:
+    """
+    A requests-per-minute token bucket for one model that adapts to the real quota.
+
+    Each 429 halves the refill rate and pauses the bucket for the server's suggested delay;
+    every successful call nudges the rate back up toward the configured budget. Waiting
+    interactive callers are always served before waiting bulk callers.
+    """
+    def __init__(self, model, requests_per_minute, min_requests_per_minute=1.0):
+        self.model = model
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = min_requests_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1.0, requests_per_minute / 6.0) # Allow short bursts of up to ten seconds' budget.
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self.updated_at = time.monotonic()
+        self._waiting = {INTERACTIVE: 0, BULK: 0}
+        self._cond = threading.Condition()
+        self.stats = {'granted': 0, 'throttled': 0, 'retries': 0, 'wait_seconds': 0.0}
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, lane=INTERACTIVE):
+        """
+        Blocks until the caller may send one request in its lane.
+        """
+        start = time.monotonic()
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    lane_is_clear = lane == INTERACTIVE or self._waiting[INTERACTIVE] == 0
+                    if now >= self.blocked_until and self.tokens >= 1 and lane_is_clear:
+                        self.tokens -= 1
+                        self.stats['granted'] += 1
+                        self.stats['wait_seconds'] += now - start
+                        return
+                    # Sleep until the next token is due (or the pause ends), re-checking on every notify.
+                    next_token = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.05
+                    self._cond.wait(max(0.05, self.blocked_until - now, next_token))
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+
+    def on_rate_limited(self, retry_after=None):
+        """
+        Reacts to a 429: halves the rate and pauses the bucket for the suggested delay.
+        """
+        with self._cond:
+            self.stats['throttled'] += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+            self._cond.notify_all()
+
+    def on_success(self):
+        """
+        Additively recovers the rate after a successful call.
+        """
+        with self._cond:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def snapshot(self):
+        """
+        Returns the current rate (in requests per minute), queue sizes and counters.
+        """
+        with self._cond:
+            return dict(
+                self.stats,
+                requests_per_minute=round(self.rate * 60, 2),
+                budget_per_minute=round(self.max_rate * 60, 2),
+                waiting=dict(self._waiting),
+                paused_for=round(max(0.0, self.blocked_until - time.monotonic()), 2),
+            )
+
+# --- Rate Limit Detection ---
+
+def is_rate_limit_error(error):
+    """
+    Recognizes 429 / quota errors from LiteLLM, the OpenAI client, or Gemini's raw messages:
+    a 429 status code, a *RateLimit* exception type, or Gemini's RESOURCE_EXHAUSTED status,
+    on the error or on one it wraps. A bare "429" in a message (an id, a token count) is not enough.
+    """
+    while error is not None:
+        if getattr(error, 'status_code', None) == 429:
+            return True
+        if any('RateLimit' in cls.__name__ for cls in type(error).__mro__) or 'RESOURCE_EXHAUSTED' in str(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+def retry_after_seconds(error):
+    """
+    Extracts the server's suggested delay (e.g. Gemini's `"retryDelay": "37s"`), if present.
+    """
+    match = re.search(r"retry[ _-]?(?:delay|after|in)\W*(\d+(?:\.\d+)?)\s*s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+# --- Process-Wide Limiter ---
+
+# Default requests-per-minute budgets; override with LLM_RPM_BUDGETS="model=rpm,model=rpm".
+DEFAULT_RPM_BUDGETS = {
+    'gemini/gemini-2.5-flash': 10,
+    'gemini/gemini-2.5-pro': 5,
+}
+
+class RateLimiter:
+    """
+    Holds one AdaptiveTokenBucket per model, shared by every agent in the process,
+    and wraps LLM clients so each call waits its turn and retries throttled requests.
+    """
+    def __init__(self, budgets, max_retries=8, max_backoff=60.0):
+        self.budgets = budgets
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, model):
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = AdaptiveTokenBucket(model, self.budgets.get(model, 10))
+            return self._buckets[model]
+
+    def install(self, llm):
+        """
+        Routes every `llm.call(...)` through the model's bucket, retrying 429s with backoff
+        so throttled calls never surface to the user. Returns the same LLM object.
+        """
+        bucket = self.bucket(llm.model)
+        original_call = llm.call
+
+        def rate_limited_call(*args, **kwargs):
+            for attempt in range(self.max_retries + 1):
+                bucket.acquire(current_lane.get())
+                try:
+                    result = original_call(*args, **kwargs)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == self.max_retries:
+                        raise
+                    retry_after = retry_after_seconds(e)
+                    bucket.on_rate_limited(retry_after)
+                    bucket.stats['retries'] += 1
+                    backoff = retry_after if retry_after is not None else min(self.max_backoff, 2 ** attempt) + random.uniform(0, 1)
+                    print(f"⏳ {llm.model} was rate limited; retrying in {backoff:.1f}s (attempt {attempt + 1}/{self.max_retries}).")
+                    time.sleep(backoff)
+                    continue
+                bucket.on_success()
+                return result
+
+        llm.call = rate_limited_call
+        return llm
+
+    def stats(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {model: bucket.snapshot() for model, bucket in buckets.items()}
+
+def parse_budgets(spec):
+    """
+    Parses "model=rpm,model=rpm" into a dict, on top of DEFAULT_RPM_BUDGETS.
+    """
+    budgets = dict(DEFAULT_RPM_BUDGETS)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        model, _, rpm = item.rpartition('=')
+        budgets[model.strip()] = float(rpm)
+    return budgets
+
+RATE_LIMITER = RateLimiter(parse_budgets(os.getenv("LLM_RPM_BUDGETS", "")))
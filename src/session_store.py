@@ -0,0 +1,121 @@
+# src/session_store.py
+
+# Standard library imports
+import json # Serializes session data for the Redis backend.
+import os # Reads the session backend settings from environment variables.
+import secrets # Generates unguessable session ids.
+
+# Third-party library imports
+from flask.sessions import SessionInterface, SessionMixin # Flask's hooks for loading and saving `session`.
+from werkzeug.datastructures import CallbackDict # Dict that notices its own changes, like Flask's cookie session.
+
+# Local application imports
+from src.cache import SQLiteCache, TTLCache, data_path # Reused as the in-memory and SQLite session backends.
+
+# --- Session Backends ---
+
+class RedisSessionBackend:
+    """
+    Keeps sessions in Redis (or any server speaking its protocol, e.g. Valkey or KeyDB), so
+    every worker process and host behind a load balancer sees the same sessions.
+    Same get/set/delete interface as TTLCache and SQLiteCache.
+    """
+    def __init__(self, url, ttl=3600, prefix="session:"):
+        try:
+            import redis # Optional dependency, only needed for this backend.
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND=redis needs the 'redis' package: pip install redis")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        value = self.client.get(self.prefix + key)
+        return default if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl if ttl is None else ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+def create_session_backend(kind, ttl):
+    """
+    Builds the backend named by `kind`: 'memory' (per process), 'sqlite' (shared by the
+    processes on one host) or 'redis' (shared by every host).
+    """
+    if kind == 'memory':
+        return TTLCache(max_size=int(os.getenv("SESSION_MEMORY_SIZE", "10000")), ttl=ttl)
+    if kind == 'sqlite':
+        backend = SQLiteCache(os.getenv("SESSION_DB", data_path("sessions.sqlite3")), ttl=ttl)
+        backend.purge_expired()
+        return backend
+    if kind == 'redis':
+        return RedisSessionBackend(os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0"), ttl=ttl)
+    raise ValueError(f"Unknown SESSION_BACKEND '{kind}'; use memory, sqlite or redis.")
+
+# --- Flask Session Interface ---
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    The `session` object for one request. Only `sid` travels in the cookie; the data
+    itself (plans, BOM tables, Notion entries) stays in the backend.
+    """
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Stores Flask sessions in a backend keyed by a random id kept in the session cookie.
+
+    The cookie stays a few dozen bytes however large the stage outputs get, and because
+    the data lives in the backend rather than in a cookie signed with a per-process key,
+    any worker sharing the backend can serve any request. Sessions are written back only
+    when a request changed them, and expire `ttl` seconds after their last change.
+    """
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.backend.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        # Unknown or expired ids are replaced, so a client can never choose its own id.
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified:
+            self.backend.set(session.sid, dict(session), ttl=self.ttl)
+        if session.new or session.modified:
+            response.set_cookie(
+                name,
+                session.sid,
+                max_age=self.ttl,
+                httponly=self.get_cookie_httponly(app),
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+                domain=domain,
+                path=path,
+            )
+
+# Sessions expire after SESSION_TTL seconds without changes (default: one week).
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(7 * 86400)))
+
+# Process-wide session interface; SESSION_BACKEND picks where the data lives.
+SESSION_INTERFACE = ServerSideSessionInterface(create_session_backend(os.getenv("SESSION_BACKEND", "sqlite"), SESSION_TTL), SESSION_TTL)
@@ -0,0 +1,159 @@
+# src/sourcing.py
+
+# Standard library imports
+import os # Reads the sourcing pool size from environment variables.
+import threading # Stops queued components from starting once a rate limit is hit.
+
+# Local application imports
+from src.bom_table import FINAL_BOM_COLUMNS, normalize_component_name, parse_markdown_table, render_markdown_table, row_value # Shared BOM table helpers.
+from src.checkpoints import CHECKPOINTS # Per-session record of components already sourced.
+from src.executor import iter_completed # Runs the per-component sourcing crews side by side.
+from src.jobs import publish_event, report_progress # Streams sourcing progress to the user.
+from src.price_index import PRICE_INDEX # Local component price/URL index checked before any search.
+from src.rate_limiter import is_rate_limit_error # Tells a rate limit apart from other sourcing failures.
+from src.structured_output import SourcedComponent, StructuredOutputError # Typed parsing of each component's sourcing result.
+
+# How many components are searched for at once. Every LLM call still goes through the
+# process-wide RATE_LIMITER, so this bounds concurrency, not the request rate.
+SOURCING_WORKERS = int(os.getenv("SOURCING_WORKERS", "4"))
+
+# --- Per-Component Sourcing ---
+
+def source_component(crew_manager, row, rate_limited):
+    """
+    Sources one conceptual BOM row with its own parts_sourcer crew and returns it as a final-BOM row.
+
+    The component name and quantity are taken from the conceptual row, not from the agent's
+    answer, so the merged table always lists exactly what was designed. A component whose
+    price cannot be found, or whose answer cannot be parsed, comes back priced 'N/A'.
+    Returns None, and sets the `rate_limited` event, if the run hit a rate limit; once the
+    event is set, components that have not started yet are skipped.
+    """
+    if rate_limited.is_set():
+        return None
+    name = row_value(row, 'component', 'name')
+    quantity = row_value(row, 'quantity', 'qty', default='1')
+    inputs = {'component_name': name, 'quantity': quantity, 'purpose': row_value(row, 'purpose', 'description')}
+    not_found = {'Component Name': name, 'Quantity': quantity, 'Price (INR)': 'N/A', 'Purchase URL': 'N/A'}
+
+    # Each component gets its own agent, so concurrent runs never share a ReAct loop or iteration budget.
+    with crew_manager.fork() as unit:
+        try:
+            result = unit.kickoff('sourcing', inputs)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                rate_limited.set()
+                return None
+            print(f"⚠️ Sourcing '{name}' failed: {e}")
+            return not_found
+        if "RATE_LIMIT_HIT" in result.raw:
+            rate_limited.set()
+            return None
+        try:
+            component = unit.parse('sourcing', inputs, result, SourcedComponent)
+        except StructuredOutputError as e:
+            print(f"⚠️ {e}")
+            return not_found
+        # The cache is keyed on the part name alone, so a miss must not be replayed to every
+        # later project that needs this part; only priced answers stay cached.
+        if component.price_inr == 'N/A':
+            unit.forget('sourcing', inputs)
+    return dict(component.to_row(), **{'Component Name': name, 'Quantity': quantity})
+
+def summarize_sourcing(sourced_rows, known_count):
+    """
+    Writes the user-facing summary of a finished sourcing run from the final rows.
+    """
+    priced = [row for row in sourced_rows if row['Price (INR)'] != 'N/A']
+    missing = [row['Component Name'] for row in sourced_rows if row['Price (INR)'] == 'N/A']
+    lines = []
+    if sourced_rows:
+        lines.append(f"I searched for {len(sourced_rows)} components and found prices for {len(priced)} of them.")
+    if missing:
+        lines.append(f"No reliable price was found for: {', '.join(missing)}. Please check these manually.")
+    if known_count:
+        lines.append(f"{known_count} components were filled in from earlier searches.")
+    return "\n\n".join(lines) or "There were no components to source."
+
+def estimated_total(rows):
+    """
+    Sums price × quantity over the rows that have a numeric price; returns (total, priced_count).
+    """
+    total, counted = 0.0, 0
+    for row in rows:
+        try:
+            total += float(row['Price (INR)']) * int(row['Quantity'])
+            counted += 1
+        except (TypeError, ValueError):
+            continue
+    return total, counted
+
+# --- Stage 2 Sourcing ---
+
+def source_bom(crew_manager, conceptual_bom_table, checkpoint_id):
+    """
+    Turns the conceptual BOM into the final, priced BOM.
+
+    Components sourced in an earlier, interrupted attempt (recorded under `checkpoint_id`) and
+    components already in the PRICE_INDEX are filled in directly. Each remaining component is
+    sourced by its own small crew on a pool of SOURCING_WORKERS threads, so the stage takes as
+    long as its slowest component rather than the sum of all of them. Results are merged in
+    conceptual-table order and written back to the index for next time.
+
+    Returns a dict with `rate_limited`, `user_summary` and `final_bom_table`.
+    """
+    conceptual_rows = parse_markdown_table(conceptual_bom_table)
+
+    # Rows are tracked by their position in the conceptual table, so the final table keeps its
+    # order however each row was filled in. Skip anything this session already sourced before
+    # a rate limit paused it.
+    already_sourced = CHECKPOINTS.sourced_components(checkpoint_id)
+    resumed_rows, remaining_rows = {}, {}
+    for index, row in enumerate(conceptual_rows):
+        name_key = normalize_component_name(row_value(row, 'component', 'name'))
+        if name_key in already_sourced:
+            resumed_rows[index] = already_sourced[name_key]
+        else:
+            remaining_rows[index] = row
+    if resumed_rows:
+        report_progress(f"📌 Checkpoint: {len(resumed_rows)} components were already sourced before the pause.")
+
+    indexed_rows, missing_rows = PRICE_INDEX.partition(remaining_rows)
+    report_progress(f"📇 Price index: {len(indexed_rows)} of {len(remaining_rows)} remaining components already known.")
+    for row in indexed_rows.values():
+        publish_event('component', name=row['Component Name'], price=row['Price (INR)'], source='index')
+    known_rows = {**resumed_rows, **indexed_rows}
+
+    # Fan the unknown components out, one sourcing crew each. A result is checkpointed as soon
+    # as it arrives, so a rate limit only loses the components that were still in flight.
+    rate_limited = threading.Event()
+    jobs = {index: (lambda row=row: source_component(crew_manager, row, rate_limited)) for index, row in missing_rows.items()}
+    sourced_by_index = {}
+    if jobs:
+        report_progress(f"🔎 Searching for {len(jobs)} components, {min(SOURCING_WORKERS, len(jobs))} at a time...")
+        for index, row, _ in iter_completed(jobs, label="Stage 2 sourcing", max_workers=SOURCING_WORKERS):
+            if row is None:
+                continue # Rate limited, or skipped after another component was.
+            sourced_by_index[index] = row
+            publish_event('component', name=row['Component Name'], price=row['Price (INR)'], source='search')
+            if row['Price (INR)'] != 'N/A':
+                CHECKPOINTS.record_components(checkpoint_id, [row])
+
+    if rate_limited.is_set():
+        saved = sum(row['Price (INR)'] != 'N/A' for row in sourced_by_index.values())
+        report_progress(f"📌 Checkpoint: saved {saved} sourced components before the rate limit.")
+        return {'rate_limited': True, 'user_summary': None, 'final_bom_table': None}
+
+    sourced_rows = [sourced_by_index[index] for index in sorted(sourced_by_index)]
+    if sourced_rows:
+        recorded = PRICE_INDEX.record_rows(sourced_rows)
+        print(f"📇 Price index: recorded {recorded} newly sourced components.")
+
+    # Merge known and freshly sourced parts in conceptual-table order, numbered consistently.
+    rows_by_index = {**known_rows, **sourced_by_index}
+    final_rows = [rows_by_index[index] for index in sorted(rows_by_index)]
+    user_summary = summarize_sourcing(sourced_rows, len(known_rows))
+    total, counted = estimated_total(final_rows)
+    if counted:
+        user_summary += f"\n\nEstimated cost of the {counted} priced components: ₹{total:,.0f}."
+    return {'rate_limited': False, 'user_summary': user_summary, 'final_bom_table': render_markdown_table(FINAL_BOM_COLUMNS, final_rows)}
@@ -0,0 +1,202 @@
+# src/stages.py
+
+# Standard library imports
+import os # Provides functions for interacting with the operating system.
+import re # Regular expression operations, used for parsing text.
+
+# Local application imports
+from src.checkpoints import CHECKPOINTS # Per-session Stage 2 progress, used to resume after a rate limit.
+from src.executor import iter_completed, run_concurrently # Runs independent crews side by side.
+from src.jobs import report_progress # Prints progress and streams it to the user.
+from src.notion_writer import page # Describes the Notion pages each stage publishes.
+from src.outbox import NOTION_OUTBOX # Publishes Notion pages in the background, with retries.
+from src.prompt_compaction import compact_bom, compact_inputs, compact_plan # Shrinks earlier outputs before they go into prompts.
+from src.sourcing import source_bom # Stage 2 sourcing backed by the local price index.
+from src.structured_output import ConceptualBOM, ProjectDiagrams # Schemas for the design and diagram outputs.
+
+# Human-readable names used when reporting a failed stage.
+STAGE_LABELS = {'planning': 'Stage 1', 'bom': 'Stage 2', 'final_assets': 'Stage 3'}
+
+# --- Crew Access ---
+
+def new_crew_manager():
+    """
+    Returns a new ProjectPartnerCrew. `src.crew` pulls in CrewAI, LiteLLM and the LLM clients,
+    so it is imported on the first stage that runs rather than when the app starts.
+    """
+    from src.crew import ProjectPartnerCrew # Deferred: the slowest import in the app.
+    return ProjectPartnerCrew()
+
+# --- Stage Results ---
+
+def stage_result(response, session_updates=None, clear_session=False):
+    """
+    Packages what a stage produced. Stages run on worker threads without access to the
+    Flask session, so the values to store are returned and applied when the result is collected.
+    """
+    return {'response': response, 'session': session_updates or {}, 'clear_session': clear_session}
+
+# --- Output Parsing Helpers ---
+
+def clean_code_block(text: str, language: str) -> str:
+    """
+    Helper function to extract and clean a code block from a given text.
+    It looks for content enclosed in ```<language> ... ```.
+    """
+    match = re.search(rf"```{language}\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
+    return match.group(1).strip() if match else text.strip()
+
+# --- Stage 1: Planning ---
+
+def run_planning_stage(project_details):
+    """
+    Kicks off the planning crew for the user's project description.
+    """
+    report_progress(f"🚀 Stage 1: Planning for -> {project_details}")
+    # Check out the planning agent from the shared pool and run the planning crew.
+    with new_crew_manager() as crew_manager:
+        result = crew_manager.kickoff('planning', {'project_details': project_details})
+
+    report_progress(f"✅ Stage 1 Finished.")
+    # Return the planning result and a prompt for the next stage, and store the plan and details in the session.
+    return stage_result(
+        {"result": result.raw, "prompt": "Enter 'Proceed' to generate the Bill of Materials."},
+        {'project_plan': result.raw, 'project_details': project_details},
+    )
+
+# --- Stage 2: Bill of Materials ---
+
+def design_bom(crew_manager, project_plan):
+    """
+    Runs the design crew and returns its conceptual BOM as a markdown table.
+    """
+    inputs = compact_inputs('design', {'project_plan': project_plan}, {'project_plan': compact_plan})
+    design = crew_manager.parse('design', inputs, crew_manager.kickoff('design', inputs), ConceptualBOM)
+    return design.to_table()
+
+def run_bom_stage(state):
+    """
+    Names the project, designs a conceptual BOM, sources final parts, and writes the
+    results to the Notion outbox. `state` is a snapshot of the user's session.
+    """
+    project_plan = state['project_plan']
+    project_details = state['project_details']
+    session_id = state['sid']
+    session_updates = {}
+
+    report_progress(f"🚀 Stage 2: Generating BOM content for -> {project_details}")
+    # Agents are checked out of the shared pool only for the LLM part of this stage.
+    with new_crew_manager() as crew_manager:
+        # Check this session's checkpoint to resume progress if available.
+        checkpoint = CHECKPOINTS.load(session_id)
+        if 'conceptual_bom_table' not in checkpoint:
+            # Naming and design are independent of each other, so they run concurrently.
+            report_progress("🧠 Generating project name and designing conceptual BOM in parallel...")
+            results, _ = run_concurrently({
+                'naming': lambda: crew_manager.kickoff('naming', {'project_details': project_details}),
+                'design': lambda: design_bom(crew_manager, project_plan),
+            }, label="Stage 2 naming + design")
+            checkpoint = {'project_name': results['naming'].raw, 'conceptual_bom_table': results['design']}
+            CHECKPOINTS.save(session_id, **checkpoint)
+        else:
+            report_progress("Resuming from a saved checkpoint...")
+        session_updates['project_name'] = checkpoint['project_name']
+        session_updates['conceptual_bom_table'] = checkpoint['conceptual_bom_table']
+
+        report_progress("🧠 Sourcing final parts...")
+
+        # Source the conceptual BOM, skipping parts sourced before a pause and checking the price index before searching.
+        sourcing = source_bom(crew_manager, session_updates['conceptual_bom_table'], session_id)
+
+    # Handle rate limit hits from external APIs.
+    if sourcing['rate_limited']:
+        report_progress("🚨 Rate limit hit. Process paused. Progress has been saved.")
+        return stage_result({
+            "result": "I'm working on your component list, but I've hit a temporary API limit. Your progress is saved!",
+            "prompt": "Please wait 60 seconds and then enter 'Proceed' again to continue from where I left off."
+        }, session_updates)
+
+    # Remove this session's checkpoint after successful sourcing.
+    CHECKPOINTS.clear(session_id)
+
+    user_summary, final_bom_table = sourcing['user_summary'], sourcing['final_bom_table']
+
+    project_name = session_updates['project_name']
+
+    # Queue the project page and its two BOM pages as one tree; the outbox publishes it in the
+    # background, so a slow or failing Notion API never delays (or fails) this response.
+    project_tree = page(project_name, children=[
+        page("Conceptual BOM", [session_updates['conceptual_bom_table']]),
+        page("Final Bill of Materials (BOM)", [final_bom_table]),
+    ])
+    notion_entry = NOTION_OUTBOX.enqueue(session_id, project_tree, parent_id=os.getenv("NOTION_PARENT_PAGE_ID"))
+    session_updates['notion_entry'] = notion_entry
+    report_progress("📝 Notion pages queued for publishing.")
+
+    # Store final BOM data and prepare the output for the user.
+    session_updates['final_bom_data'] = final_bom_table.strip()
+    return stage_result({
+        "result": user_summary.strip(),
+        "prompt": "Enter 'Proceed' to generate the final assets (code and diagram).",
+        "notion_entry": notion_entry,
+    }, session_updates)
+
+# --- Stage 3: Final Assets ---
+
+def run_final_assets_stage(state):
+    """
+    Generates the diagrams and Arduino code and adds them to a guide page in Notion.
+    `state` is a snapshot of the user's session.
+    """
+    final_bom_data = state['final_bom_data']
+    conceptual_bom_table = state.get('conceptual_bom_table')
+    project_entry = state['notion_entry'] # Outbox entry of the main project FOLDER in Notion.
+    project_plan = state['project_plan']
+
+    report_progress(f"🚀 Stage 3: Generating final assets...")
+    with new_crew_manager() as crew_manager:
+        # The diagram and code crews only read the BOM and plan, so they run concurrently.
+        # Each crew's Notion blocks are built as soon as that crew returns.
+        report_progress("🧠 Generating all diagrams and Arduino code in parallel...")
+        # The crews get a plain component list (no prices or URLs) and the plan without its budget.
+        bom_compactor = {'final_bom': lambda table: compact_bom(table, conceptual_bom_table)}
+        diagram_inputs = compact_inputs('diagrams', {'final_bom': final_bom_data, 'project_plan': project_plan},
+                                        dict(bom_compactor, project_plan=lambda plan: compact_plan(plan, sections=('Description', 'Process'))))
+        code_inputs = compact_inputs('code', {'final_bom': final_bom_data}, bom_compactor)
+        stage_jobs = {
+            'diagrams': lambda: crew_manager.kickoff('diagrams', diagram_inputs),
+            'code': lambda: crew_manager.kickoff('code', code_inputs),
+        }
+
+        asset_blocks = {}
+        for name, crew_result, elapsed in iter_completed(stage_jobs, label="Stage 3 diagrams + code"):
+            report_progress(f"✅ {name} ready after {elapsed:.1f}s, building its Notion blocks...")
+            if name == 'diagrams':
+                # Parse the diagrams; a diagram that fails validation is re-asked on its own.
+                diagrams = crew_manager.parse('diagrams', diagram_inputs, crew_result, ProjectDiagrams)
+                asset_blocks[name] = [
+                    f"## {diagrams.title_workflow}",
+                    # Wrap the mermaid diagram source in a Markdown code block
+                    f"```mermaid\n{diagrams.workflow_mermaid}\n```",
+
+                    f"## {diagrams.title_architecture}",
+                    # Wrap the architecture diagram source in a Markdown code block
+                    f"```mermaid\n{diagrams.architecture_mermaid}\n```",
+                ]
+            else:
+                asset_blocks[name] = [
+                    "## Arduino Code",
+                    # Wrap the Arduino code in a Markdown code block, specifying the language
+                    f"```cpp\n{clean_code_block(crew_result.raw, 'cpp')}\n```",
+                ]
+
+    # Keep the guide page order fixed (diagrams first) regardless of which crew finished first.
+    final_content_blocks = asset_blocks['diagrams'] + asset_blocks['code']
+
+    # Queue a "Full Project Guide" page under the project folder; the outbox publishes it once
+    # the folder itself exists, even if Stage 2's pages are still being written.
+    guide_entry = NOTION_OUTBOX.enqueue(state['sid'], page("Full Project Guide", final_content_blocks), parent_entry=project_entry)
+    report_progress("📝 Final guide page queued for publishing.")
+
+    # Clear session data; the Notion link is shown once the guide page is published.
+    return stage_result({"result": "Your diagrams and Arduino code are ready and on their way to your Notion project folder!", "notion_entry": guide_entry}, clear_session=True)
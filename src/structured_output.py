@@ -0,0 +1,340 @@
+# src/structured_output.py
+
+# Standard library imports
+import json # Parses and re-serializes JSON fragments.
+import re # Finds fenced blocks and cleans up common LLM formatting slips.
+from typing import List # Type hints for the output schemas.
+
+# Third-party library imports
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator # Output schemas and their validation.
+
+# Local application imports
+from src.bom_table import parse_markdown_table, render_markdown_table, row_value # Table fallbacks and rendering.
+
+class StructuredOutputError(ValueError):
+    """
+    Raised when an LLM output cannot be turned into its schema, even after repair.
+    """
+
+# --- Output Schemas ---
+
+def first_integer(value):
+    # "2 pcs", "x2" or 2.0 all mean a quantity of 2; anything else is left for validation to reject.
+    if isinstance(value, str):
+        match = re.search(r"\d+", value)
+        return int(match.group()) if match else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+class ConceptualComponent(BaseModel):
+    name: str = Field(min_length=1, description="Component name, e.g. 'Arduino Uno R3'.")
+    quantity: int = Field(ge=1, description="How many are needed.")
+    purpose: str = Field(default="", description="What the component does in this project.")
+
+    _coerce_quantity = field_validator('quantity', mode='before')(first_integer)
+
+class ConceptualBOM(BaseModel):
+    """
+    Output of the component_reasoning_task.
+    """
+    components: List[ConceptualComponent] = Field(min_length=1)
+
+    @classmethod
+    def from_text(cls, text):
+        # Accept a markdown table too, in case the agent ignores the JSON instruction.
+        rows = parse_markdown_table(text)
+        if not rows:
+            return None
+        return {'components': [
+            {'name': row_value(row, 'component', 'name'), 'quantity': row_value(row, 'quantity', 'qty', default='1'), 'purpose': row_value(row, 'purpose', 'description')}
+            for row in rows
+        ]}
+
+    def to_table(self):
+        """
+        Renders the conceptual BOM table shown to the user and handed to sourcing.
+        """
+        rows = [{'Component Name': c.name, 'Quantity': str(c.quantity), 'Purpose': c.purpose} for c in self.components]
+        return render_markdown_table(['Sl no.', 'Component Name', 'Quantity', 'Purpose'], rows)
+
+class SourcedComponent(BaseModel):
+    """
+    Output of the component_sourcing_task: one component's price and purchase link.
+    """
+    name: str = Field(min_length=1, description="Component name, exactly as in the conceptual table.")
+    quantity: int = Field(ge=1)
+    price_inr: str = Field(description="Unit price in INR as a plain number, or 'N/A' if not found.")
+    purchase_url: str = Field(description="Product page URL, or 'N/A' if not found.")
+
+    _coerce_quantity = field_validator('quantity', mode='before')(first_integer)
+
+    @field_validator('price_inr', mode='before')
+    @classmethod
+    def normalize_price(cls, value):
+        if isinstance(value, (int, float)):
+            return f"{value:g}"
+        text = str(value).replace('₹', '').replace('Rs.', '').replace('INR', '').replace(',', '').strip()
+        if text.upper() in ('N/A', 'NA', ''):
+            return 'N/A'
+        if not re.fullmatch(r"\d+(\.\d+)?", text):
+            raise ValueError("must be a plain number of rupees, or 'N/A'")
+        return text
+
+    @field_validator('purchase_url')
+    @classmethod
+    def check_url(cls, value):
+        value = value.strip()
+        if value.upper() in ('N/A', 'NA', ''):
+            return 'N/A'
+        if not value.startswith(('http://', 'https://')):
+            raise ValueError("must be an http(s) URL, or 'N/A'")
+        return value
+
+    def to_row(self):
+        """
+        Returns the row in the final BOM's column layout (see bom_table.FINAL_BOM_COLUMNS).
+        """
+        return {'Component Name': self.name, 'Quantity': str(self.quantity), 'Price (INR)': self.price_inr, 'Purchase URL': self.purchase_url}
+
+# Mermaid sources must open with a diagram directive.
+MERMAID_DIRECTIVE = re.compile(r"^(flowchart|graph|sequenceDiagram|classDiagram|stateDiagram(-v2)?|erDiagram|journey|gantt|pie|mindmap|timeline)\b")
+
+def clean_mermaid(value):
+    # Strip a stray ```mermaid fence the model added despite being told not to.
+    if isinstance(value, str):
+        match = re.search(r"```(?:mermaid)?\s*([\s\S]*?)\s*```", value)
+        return (match.group(1) if match else value).strip()
+    return value
+
+class ProjectDiagrams(BaseModel):
+    """
+    Output of the diagram_generation_task.
+    """
+    workflow_mermaid: str = Field(description="Mermaid source for the workflow diagram.")
+    architecture_mermaid: str = Field(description="Mermaid source for the system architecture diagram.")
+    title_workflow: str = "Workflow Diagram"
+    title_architecture: str = "Architecture Diagram"
+
+    _clean = field_validator('workflow_mermaid', 'architecture_mermaid', mode='before')(clean_mermaid)
+
+    @field_validator('workflow_mermaid', 'architecture_mermaid')
+    @classmethod
+    def check_directive(cls, value):
+        if not MERMAID_DIRECTIVE.match(value):
+            raise ValueError("must start with a Mermaid directive such as 'flowchart TD'")
+        return value
+
+# --- JSON Extraction and Repair ---
+
+def find_json_text(text):
+    """
+    Returns the JSON part of an LLM reply: everything from the first '{' or '[' (after a
+    ```json fence, if there is one) to its matching bracket, or to the end if the reply was
+    cut off. Brackets are matched rather than the closing fence, because string values such
+    as Mermaid sources may contain ``` fences of their own.
+    """
+    fence = re.search(r"```json", text, re.IGNORECASE)
+    offset = fence.end() if fence else 0
+    start = min((i for i in (text.find('{', offset), text.find('[', offset)) if i >= 0), default=-1)
+    if start < 0 and fence:
+        return find_json_text(text[:fence.start()])
+    if start < 0:
+        return None
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+def close_truncated(text):
+    """
+    Candidate completions of a cut-off JSON document: closing it where it stopped, and
+    dropping the last, incomplete element. Complete elements before the cut are kept.
+    """
+    stack, in_string, escaped, last_comma = [], False, False, None
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+        elif ch == ',':
+            last_comma = (i, list(stack))
+    if not stack and not in_string:
+        return []
+    candidates = [text + ('"' if in_string else '') + ''.join(reversed(stack))]
+    if last_comma:
+        position, open_brackets = last_comma
+        candidates.append(text[:position] + ''.join(reversed(open_brackets)))
+    return candidates
+
+# Deterministic fixes for the slips LLMs make most, tried in order until the text parses.
+REPAIRS = [
+    lambda text: re.sub(r",\s*([}\]])", r"\1", text), # Trailing commas.
+    lambda text: text.replace('“', '"').replace('”', '"').replace('’', "'"), # Smart quotes.
+    lambda text: re.sub(r"\bTrue\b", "true", re.sub(r"\bFalse\b", "false", re.sub(r"\bNone\b", "null", text))), # Python literals.
+    lambda text: re.sub(r"^\s*//.*$", "", text, flags=re.MULTILINE), # Line comments.
+]
+
+def load_json(text):
+    """
+    Extracts and parses the JSON in an LLM reply, repairing common slips and salvaging the
+    complete part of a truncated reply. Returns None if no JSON can be recovered.
+    """
+    candidate = find_json_text(text or '')
+    if candidate is None:
+        return None
+    for repair in [None] + REPAIRS:
+        if repair is not None:
+            candidate = repair(candidate)
+        # strict=False accepts raw newlines and tabs inside strings.
+        for attempt in [candidate] + close_truncated(candidate):
+            try:
+                return json.loads(attempt, strict=False)
+            except ValueError:
+                continue
+    return None
+
+# --- Validation and Targeted Re-asking ---
+
+def fragment_path(location):
+    """
+    Maps a pydantic error location to the fragment to fix: a list item (e.g. `components.2`)
+    or a top-level field (e.g. `summary`).
+    """
+    if len(location) >= 2 and isinstance(location[1], int):
+        return location[:2]
+    return location[:1]
+
+def get_path(data, path):
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+def set_path(data, path, value):
+    for key in path[:-1]:
+        data = data[key]
+    if isinstance(data, list) and path[-1] >= len(data):
+        data.append(value)
+    else:
+        data[path[-1]] = value
+
+def fragment_schema(model, path):
+    # JSON schema for one fragment, so the corrective prompt stays small.
+    field = model.model_fields.get(path[0])
+    if field is None:
+        return None
+    annotation = field.annotation
+    if len(path) == 2:
+        annotation = annotation.__args__[0] # List[Item] -> Item
+    return TypeAdapter(annotation).json_schema()
+
+def find_problems(data, model):
+    """
+    Validates `data` against `model`; returns `{path: [messages]}` for each failing fragment.
+    """
+    try:
+        model.model_validate(data)
+        return {}
+    except ValidationError as e:
+        problems = {}
+        for error in e.errors():
+            problems.setdefault(tuple(fragment_path(error['loc'])), []).append(f"{'.'.join(map(str, error['loc'])) or 'output'}: {error['msg']}")
+        return problems
+
+def is_empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+def corrective_prompt(data, model, problems, context=None):
+    """
+    Asks for corrected versions of only the fragments that failed validation. When a fragment
+    is missing or empty there is nothing to correct, so the original task (`context`) is
+    included and the model writes the fragment from the task rather than from thin air.
+    """
+    lines = [
+        "Some parts of a JSON document you produced are invalid. Return ONLY a JSON object that maps",
+        "each path below to its corrected value. Do not repeat anything that is not listed.",
+        "",
+    ]
+    if context and any(is_empty(get_path(data, path)) for path in problems):
+        lines += ["The document was written for this task:", "---", context.strip(), "---", ""]
+    for path, messages in problems.items():
+        key = '.'.join(map(str, path))
+        lines.append(f"Path: {key}")
+        lines.append(f"Current value: {json.dumps(get_path(data, path))}")
+        lines.append(f"Problems: {'; '.join(messages)}")
+        schema = fragment_schema(model, path)
+        if schema is not None:
+            lines.append(f"Schema: {json.dumps(schema)}")
+        lines.append("")
+    return "\n".join(lines)
+
+def parse_output(text, model, reask=None, max_reasks=1, label=None, context=None):
+    """
+    Turns an LLM reply into an instance of `model`.
+
+    The JSON is extracted and repaired locally first (see `load_json`), and models with a
+    `from_text` fallback also accept the markdown layouts older prompts produced. If some
+    fragments are still invalid, `reask(prompt)` is called with a short prompt covering only
+    those fragments, and its answer is merged back in; the rest of the output is kept as is.
+    `context`, the task prompt the output answers, is added for fragments that are missing or empty.
+    Raises StructuredOutputError if the output still does not validate.
+    """
+    label = label or model.__name__
+    data = load_json(text)
+    if not isinstance(data, dict) and hasattr(model, 'from_text'):
+        data = model.from_text(text or '')
+    if not isinstance(data, dict):
+        if reask is None:
+            raise StructuredOutputError(f"{label}: no JSON object found in the output.")
+        # Nothing usable was found, so ask for the whole document once, as a conversion.
+        schema = json.dumps(model.model_json_schema())
+        data = load_json(reask(f"Convert the following text into ONE JSON object matching this schema: {schema}\nReturn ONLY the JSON.\n\n{text}"))
+        if not isinstance(data, dict):
+            raise StructuredOutputError(f"{label}: no JSON object found in the output.")
+
+    for attempt in range(max_reasks + 1):
+        problems = find_problems(data, model)
+        if not problems:
+            return model.model_validate(data)
+        if reask is None or attempt == max_reasks:
+            break
+        print(f"🩹 {label}: re-asking for {len(problems)} invalid fragment(s): {', '.join('.'.join(map(str, p)) for p in problems)}")
+        fixes = load_json(reask(corrective_prompt(data, model, problems, context)))
+        if not isinstance(fixes, dict):
+            break
+        for key, value in fixes.items():
+            path = tuple(int(part) if part.isdigit() else part for part in str(key).split('.'))
+            if path in problems:
+                set_path(data, path, value)
+
+    details = "; ".join(message for messages in problems.values() for message in messages)
+    raise StructuredOutputError(f"{label}: the output does not match its schema ({details}).")
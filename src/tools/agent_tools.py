@@ -0,0 +1,112 @@
+# src/tools/agent_tools.py
+
+# Standard library imports
+import threading # Builds the tools once, even when agents are created concurrently.
+from typing import Type, Any # Used for type hinting, specifically for generic types.
+
+# Third-party library imports
+from crewai.tools import BaseTool # Base class for creating custom tools in CrewAI.
+from pydantic import BaseModel, Field, create_model # Used for data validation and settings management, and dynamic model creation.
+
+# Local application imports
+from src.jobs import report_progress # Streams each search the agent makes to the user.
+from src.observability import TRACER # Traces each tool call.
+from src.tools.composio_tools import MY_APP_USER_ID, TOOL_RESULT_CACHE, TOOL_SINGLE_FLIGHT, get_composio, load_tool_descriptions, tool_call_key # Composio client, tool descriptions, and call memoization.
+
+# --- Custom Composio Tool Class ---
+
+class ComposioCustomTool(BaseTool):
+    """
+    A custom CrewAI tool wrapper for Composio tools.
+    This class dynamically creates CrewAI-compatible tools from Composio tool descriptions.
+    """
+    name: str = Field(..., description="The name of the tool.")
+    description: str = Field(..., description="A description of what the tool does.")
+    slug: str = Field(..., description="The unique slug identifier for the Composio tool.")
+    args_schema: Type[BaseModel] = Field(..., description="Pydantic model defining the tool's input arguments.")
+
+    def _run(self, **kwargs: Any) -> Any:
+        """
+        Executes the Composio tool with the provided arguments.
+        This method is called when the CrewAI agent uses the tool.
+        Repeated calls are served from TOOL_RESULT_CACHE, and identical concurrent calls
+        share a single round trip through TOOL_SINGLE_FLIGHT.
+        """
+        report_progress(f"🔎 {self.name}: {', '.join(str(value) for value in kwargs.values())}")
+        with TRACER.span('tool.call', kind='tool', tool=self.slug) as span:
+            key = tool_call_key(self.slug, kwargs)
+            cached = TOOL_RESULT_CACHE.get(key)
+            if cached is not None:
+                span.set(source='cache')
+                return cached
+
+            def execute():
+                # Another caller may have finished the same call between our cache check and now.
+                # The miss was already counted above, so this re-check must not count another.
+                cached = TOOL_RESULT_CACHE.peek(key)
+                if cached is not None:
+                    span.set(source='cache')
+                    return cached
+                span.set(source='composio')
+                result = get_composio().tools.execute(
+                    user_id=MY_APP_USER_ID,
+                    slug=self.slug,
+                    arguments=kwargs
+                )
+                span.set(successful=bool(result.get("successful")))
+                # Only successful results are kept, so failures are retried on the next call.
+                if result.get("successful"):
+                    TOOL_RESULT_CACHE.set(key, result)
+                return result
+
+            # Callers that joined an identical call already in flight never run `execute`.
+            span.set(source='coalesced')
+            return TOOL_SINGLE_FLIGHT.do(key, execute)
+
+# --- Dynamic Tool Creation ---
+
+_agent_tools = None
+_agent_tools_lock = threading.Lock()
+
+def build_agent_tools(raw_tool_descriptions):
+    """
+    Builds CrewAI tools from raw Composio tool descriptions.
+    """
+    # List to store the dynamically created CrewAI tools.
+    tools_for_agents = []
+    for tool_dict in raw_tool_descriptions:
+        # Extract tool name and description from the Composio tool dictionary.
+        tool_name = tool_dict['function']['name']
+        tool_description = tool_dict['function']['description']
+
+        # Dynamically build the arguments schema for the tool using Pydantic.
+        args_fields = {}
+        if 'parameters' in tool_dict['function'] and 'properties' in tool_dict['function']['parameters']:
+            for prop, details in tool_dict['function']['parameters']['properties'].items():
+                # Each property becomes a field in the Pydantic model.
+                args_fields[prop] = (str, Field(..., description=details.get('description')))
+
+        # Create a Pydantic model for the tool's arguments.
+        ArgsSchema = create_model(f"{tool_name.replace('.', '_')}Schema", **args_fields)
+
+        # Instantiate the custom Composio tool and add it to the list.
+        new_tool = ComposioCustomTool(
+            name=tool_name,
+            description=tool_description,
+            slug=tool_name,
+            args_schema=ArgsSchema
+        )
+        tools_for_agents.append(new_tool)
+    return tools_for_agents
+
+def get_agent_tools():
+    """
+    Returns the agent-facing tools, building them the first time an agent needs them.
+    """
+    global _agent_tools
+    with _agent_tools_lock:
+        if _agent_tools is None:
+            _agent_tools = build_agent_tools(load_tool_descriptions())
+            # Confirmation message that tools have been successfully built.
+            print("✅ Successfully built agent-facing tools from Composio data.")
+        return _agent_tools
@@ -1,82 +1,162 @@
 # src/tools/composio_tools.py
 
 # Standard library imports
+import json # Reads and writes the on-disk tool description cache.
 import os # Provides functions for interacting with the operating system.
-from typing import Type, Any # Used for type hinting, specifically for generic types.
+import threading # Creates the client once, even when first used from several threads.
+import time # Ages the tool description cache.
+from importlib import metadata # Reads the installed Composio version without importing it.
 
-# Third-party library imports
-from composio import Composio # Imports the Composio client for interacting with external tools.
-from crewai.tools import BaseTool # Base class for creating custom tools in CrewAI.
-from pydantic import BaseModel, Field, create_model # Used for data validation and settings management, and dynamic model creation.
+# Local application imports
+from src.cache import SingleFlight, TTLCache, data_path, make_key, normalize_text # Memoizes and coalesces repeated tool calls.
 
 # --- Configuration and Initialization ---
 
 # Define a unique user ID for the application to interact with Composio.
 MY_APP_USER_ID = "build-with-me-buddy-developer-001"
 
-# Initialize the Composio client.
-composio_instance = Composio()
-
 # List of tool names (slugs) that this agent will use from Composio.
 # Currently configured to use DuckDuckGo search.
 agent_tool_names = ["COMPOSIO_SEARCH_DUCK_DUCK_GO_SEARCH"]
 
-# Fetch raw tool descriptions from Composio based on the specified tool names.
-raw_tool_descriptions = composio_instance.tools.get(
-    user_id=MY_APP_USER_ID,
-    tools=agent_tool_names
-)
+# "composio" talks to the real service; "stub" uses the offline backend in stub_backend.py.
+COMPOSIO_BACKEND = os.getenv("COMPOSIO_BACKEND", "composio")
 
-# --- Custom Composio Tool Class ---
+_composio_instance = None
+_composio_lock = threading.Lock()
 
-class ComposioCustomTool(BaseTool):
+def get_composio():
+    """
+    Returns the process-wide Composio client, creating it on first use so that importing
+    this module never waits on the network.
+    """
+    global _composio_instance
+    with _composio_lock:
+        if _composio_instance is None:
+            if COMPOSIO_BACKEND == "stub":
+                from src.tools.stub_backend import StubComposio # Offline backend for local runs and benchmarks.
+                _composio_instance = StubComposio()
+            else:
+                from composio import Composio # Imported lazily; the SDK is slow to import.
+                _composio_instance = Composio()
+        return _composio_instance
+
+# --- Tool Description Cache ---
+
+# Bump when the cache file layout changes, so old files are ignored rather than misread.
+TOOL_CACHE_FORMAT = 1
+TOOL_DESCRIPTIONS_PATH = os.getenv("COMPOSIO_TOOL_CACHE", data_path("composio_tools_cache.json"))
+# Cached descriptions older than this are refreshed (default: one week).
+TOOL_DESCRIPTIONS_MAX_AGE = float(os.getenv("COMPOSIO_TOOL_CACHE_MAX_AGE", str(7 * 86400)))
+# When set, a stale cache is used immediately and refreshed on a background thread.
+TOOL_DESCRIPTIONS_BACKGROUND_REFRESH = os.getenv("COMPOSIO_TOOL_REFRESH", "").lower() in ("1", "true", "background")
+
+def composio_version():
+    try:
+        return metadata.version("composio")
+    except metadata.PackageNotFoundError:
+        return None
+
+def fetch_tool_descriptions():
     """
-    A custom CrewAI tool wrapper for Composio tools.
-    This class dynamically creates CrewAI-compatible tools from Composio tool descriptions.
+    Fetches the raw tool descriptions from Composio and writes them to the disk cache.
     """
-    name: str = Field(..., description="The name of the tool.")
-    description: str = Field(..., description="A description of what the tool does.")
-    slug: str = Field(..., description="The unique slug identifier for the Composio tool.")
-    args_schema: Type[BaseModel] = Field(..., description="Pydantic model defining the tool's input arguments.")
-
-    def _run(self, **kwargs: Any) -> Any:
-        """
-        Executes the Composio tool with the provided arguments.
-        This method is called when the CrewAI agent uses the tool.
-        """
-        return composio_instance.tools.execute(
-            user_id=MY_APP_USER_ID,
-            slug=self.slug,
-            arguments=kwargs
-        )
-
-# --- Dynamic Tool Creation ---
-
-# List to store the dynamically created CrewAI tools.
-tools_for_agents = []
-for tool_dict in raw_tool_descriptions:
-    # Extract tool name and description from the Composio tool dictionary.
-    tool_name = tool_dict['function']['name']
-    tool_description = tool_dict['function']['description']
-
-    # Dynamically build the arguments schema for the tool using Pydantic.
-    args_fields = {}
-    if 'parameters' in tool_dict['function'] and 'properties' in tool_dict['function']['parameters']:
-        for prop, details in tool_dict['function']['parameters']['properties'].items():
-            # Each property becomes a field in the Pydantic model.
-            args_fields[prop] = (str, Field(..., description=details.get('description')))
-
-    # Create a Pydantic model for the tool's arguments.
-    ArgsSchema = create_model(f"{tool_name.replace('.', '_')}Schema", **args_fields)
-
-    # Instantiate the custom Composio tool and add it to the list.
-    new_tool = ComposioCustomTool(
-        name=tool_name,
-        description=tool_description,
-        slug=tool_name,
-        args_schema=ArgsSchema
+    descriptions = get_composio().tools.get(user_id=MY_APP_USER_ID, tools=agent_tool_names)
+    if COMPOSIO_BACKEND != "stub":
+        entry = {
+            'format': TOOL_CACHE_FORMAT,
+            'composio_version': composio_version(),
+            'tools': sorted(agent_tool_names),
+            'fetched_at': time.time(),
+            'sha256': make_key(descriptions),
+            'descriptions': descriptions,
+        }
+        # Write to a temporary file and rename it, so readers never see a half-written cache.
+        tmp_path = f"{TOOL_DESCRIPTIONS_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, TOOL_DESCRIPTIONS_PATH)
+    return descriptions
+
+def read_cached_tool_descriptions():
+    """
+    Returns `(descriptions, is_fresh)` from the disk cache, or `(None, False)` if the file is
+    missing, corrupt, or was written for another cache format, Composio version or tool list.
+    """
+    try:
+        with open(TOOL_DESCRIPTIONS_PATH) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None, False
+    valid = (
+        entry.get('format') == TOOL_CACHE_FORMAT
+        and entry.get('composio_version') == composio_version()
+        and entry.get('tools') == sorted(agent_tool_names)
+        and entry.get('sha256') == make_key(entry.get('descriptions'))
     )
-    tools_for_agents.append(new_tool)
+    if not valid:
+        return None, False
+    return entry['descriptions'], time.time() - entry['fetched_at'] < TOOL_DESCRIPTIONS_MAX_AGE
+
+def refresh_tool_descriptions_in_background():
+    def refresh():
+        try:
+            fetch_tool_descriptions()
+            print("✅ Refreshed the cached Composio tool descriptions.")
+        except Exception as e:
+            print(f"⚠️ Could not refresh the Composio tool descriptions: {e}")
+    threading.Thread(target=refresh, name="composio-tool-refresh", daemon=True).start()
+
+def load_tool_descriptions():
+    """
+    Returns the raw tool descriptions, from the disk cache when it is valid and fresh.
+    A stale cache is refreshed in the background when COMPOSIO_TOOL_REFRESH is set,
+    and otherwise before returning; it is still used if Composio cannot be reached.
+    """
+    if COMPOSIO_BACKEND == "stub":
+        return fetch_tool_descriptions()
+    descriptions, is_fresh = read_cached_tool_descriptions()
+    if descriptions is not None and is_fresh:
+        return descriptions
+    if descriptions is not None and TOOL_DESCRIPTIONS_BACKGROUND_REFRESH:
+        refresh_tool_descriptions_in_background()
+        return descriptions
+    try:
+        return fetch_tool_descriptions()
+    except Exception as e:
+        if descriptions is None:
+            raise
+        print(f"⚠️ Could not refresh the Composio tool descriptions ({e}); using the cached copy.")
+        return descriptions
+
+# --- Tool Call Memoization ---
+
+# Completed tool results, keyed on slug plus canonicalized arguments. Search results go stale,
+# so entries only live for TOOL_CACHE_TTL seconds (default: one hour).
+TOOL_RESULT_CACHE = TTLCache(
+    max_size=int(os.getenv("TOOL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TOOL_CACHE_TTL", "3600")),
+)
+# Identical calls that are still in flight share one execution.
+TOOL_SINGLE_FLIGHT = SingleFlight()
 
-# Confirmation message that tools have been successfully built.
-print("✅ Successfully built agent-facing tools from Composio data.")
+def tool_call_key(slug, arguments):
+    """
+    Canonicalizes a tool call so near-identical queries (case, extra whitespace) share a key.
+    """
+    return make_key(slug, {name: normalize_text(value) for name, value in arguments.items()})
+
+def tool_call_stats():
+    """
+    Reports how many tool calls really ran and how many were saved by the cache or by coalescing.
+    """
+    cache_hits = TOOL_RESULT_CACHE.stats['hits']
+    coalesced = TOOL_SINGLE_FLIGHT.stats['coalesced']
+    return {
+        'executed': TOOL_SINGLE_FLIGHT.stats['executed'],
+        'cache_hits': cache_hits,
+        'coalesced': coalesced,
+        'calls_saved': cache_hits + coalesced,
+        'cache_evictions': TOOL_RESULT_CACHE.stats['evictions'],
+        'cache_size': len(TOOL_RESULT_CACHE),
+    }
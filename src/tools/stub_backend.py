@@ -0,0 +1,76 @@
+# src/tools/stub_backend.py
+
+# Standard library imports
+import hashlib # Derives stable fake prices and ids from the inputs.
+import itertools # Numbers the fake Notion pages.
+import os # Reads the simulated latency and failure rate from environment variables.
+import random # Injects failures, reproducibly when seeded.
+import time # Simulates network latency.
+
+# --- Canned Tool Descriptions ---
+
+# Same shape as `Composio().tools.get(...)` returns for the tools this app uses.
+STUB_TOOL_DESCRIPTIONS = {
+    "COMPOSIO_SEARCH_DUCK_DUCK_GO_SEARCH": {
+        "type": "function",
+        "function": {
+            "name": "COMPOSIO_SEARCH_DUCK_DUCK_GO_SEARCH",
+            "description": "Searches the web with DuckDuckGo and returns the top results with their titles, links and snippets.",
+            "parameters": {
+                "type": "object",
+                "properties": {"query": {"type": "string", "description": "The search query."}},
+                "required": ["query"],
+            },
+        },
+    },
+}
+
+# --- Stub Backend ---
+
+class StubTools:
+    """
+    Offline stand-in for `Composio().tools`: returns canned tool descriptions and fake,
+    deterministic results for the search and Notion actions the app calls. A `failure_rate`
+    share of calls fails the way Composio reports errors, to exercise retries.
+    """
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._page_numbers = itertools.count(1)
+
+    def get(self, user_id, tools):
+        return [STUB_TOOL_DESCRIPTIONS[slug] for slug in tools if slug in STUB_TOOL_DESCRIPTIONS]
+
+    def execute(self, user_id, slug, arguments):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return {"successful": False, "data": {}, "error": f"Injected stub failure for {slug}."}
+        if slug == "NOTION_CREATE_NOTION_PAGE":
+            page_id = f"stub-page-{next(self._page_numbers)}"
+            return {"successful": True, "data": {"id": page_id, "url": f"https://www.notion.so/{page_id}"}, "error": None}
+        if slug == "NOTION_ADD_MULTIPLE_PAGE_CONTENT":
+            return {"successful": True, "data": {"blocks_added": len(arguments.get("content_blocks", []))}, "error": None}
+        if slug == "COMPOSIO_SEARCH_DUCK_DUCK_GO_SEARCH":
+            query = arguments.get("query", "")
+            digest = hashlib.sha256(query.encode('utf-8')).hexdigest()
+            price = 50 + int(digest[:6], 16) % 1950 # A stable fake price between ₹50 and ₹2000.
+            return {"successful": True, "data": {"results": [{
+                "title": f"{query} - Buy Online",
+                "link": f"https://robu.in/product/stub-{digest[:12]}/",
+                "snippet": f"{query} in stock. Price: ₹{price}.",
+            }]}, "error": None}
+        return {"successful": False, "data": {}, "error": f"The stub Composio backend does not implement {slug}."}
+
+class StubComposio:
+    """
+    Offline stand-in for the Composio client, selected with COMPOSIO_BACKEND=stub so the app,
+    benchmarks and local experiments run without network access or a Composio account.
+    """
+    def __init__(self, latency=None, failure_rate=None):
+        if latency is None:
+            latency = float(os.getenv("STUB_COMPOSIO_LATENCY_MS", "0")) / 1000
+        if failure_rate is None:
+            failure_rate = float(os.getenv("STUB_COMPOSIO_FAILURE_RATE", "0"))
+        self.tools = StubTools(latency, failure_rate, seed=os.getenv("STUB_SEED"))
@@ -112,15 +112,18 @@ document.addEventListener('DOMContentLoaded', () => {
                 body: JSON.stringify(body),
             });
 
-            removeTypingIndicator();
             if (!response.ok) {
                 const errData = await response.json();
-                throw new Error(errData.details || `Server error: ${response.status}`);
+                throw new Error(errData.details || errData.error || `Server error: ${response.status}`);
             }
 
-            const data = await response.json();
+            // The stage runs as a background job; wait for it to finish, then collect its result.
+            const job = await response.json();
+            const data = await waitForJob(job);
+            removeTypingIndicator();
 
             if (data.result) addMessage(data.result, 'bot-message');
+            if (data.notion_status_url) followNotionPublish(data.notion_status_url);
             if (data.prompt) addPromptMessage(data.prompt);
 
             // Update conversation state based on the successful API call
@@ -139,6 +142,92 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+    function followJobEvents(job) {
+        // Render the job's live progress from its Server-Sent Events stream.
+        // Resolves with the job's final status, or with null if the stream is closed for good
+        // before the job finishes (the caller then falls back to polling).
+        return new Promise((resolve) => {
+            const source = new EventSource(job.events_url);
+            const liveOutputs = {};
+
+            const finish = (status) => {
+                source.close();
+                Object.values(liveOutputs).forEach(bubble => bubble.remove());
+                resolve(status);
+            };
+
+            source.addEventListener('progress', (e) => {
+                addProgressMessage(JSON.parse(e.data).message);
+            });
+            source.addEventListener('component', (e) => {
+                const part = JSON.parse(e.data);
+                const origin = part.source === 'index' ? 'from price index' : 'found online';
+                addProgressMessage(`🔩 ${part.name}: ${part.price} (${origin})`);
+            });
+            source.addEventListener('token', (e) => {
+                const token = JSON.parse(e.data);
+                const agent = token.agent || 'Assistant';
+                if (!liveOutputs[agent]) liveOutputs[agent] = addLiveOutput(agent);
+                liveOutputs[agent].querySelector('.live-output-text').textContent += token.chunk;
+                scrollToBottom();
+            });
+            source.addEventListener('status', (e) => {
+                const status = JSON.parse(e.data).status;
+                if (status === 'succeeded' || status === 'failed') finish(status);
+            });
+            // On a dropped connection the browser reconnects by itself, sending Last-Event-ID so the
+            // server resumes where the stream stopped; only give up once it stops retrying.
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) finish(null);
+            };
+        });
+    }
+
+    async function waitForJob(job) {
+        let status = (window.EventSource && job.events_url) ? await followJobEvents(job) : null;
+
+        // Without a finished stream, poll the job's status until it leaves the queue and finishes running.
+        for (let polls = 0; status !== 'succeeded' && status !== 'failed'; polls++) {
+            if (polls > 0) await sleep(2000);
+            const statusResponse = await fetch(job.status_url);
+            if (!statusResponse.ok) throw new Error(`Lost track of the job: ${statusResponse.status}`);
+            status = (await statusResponse.json()).status;
+        }
+
+        const resultResponse = await fetch(job.result_url);
+        const data = await resultResponse.json();
+        if (!resultResponse.ok) throw new Error(data.details || data.error || `Server error: ${resultResponse.status}`);
+        return data;
+    }
+
+    async function followNotionPublish(statusUrl) {
+        // Notion pages are published in the background; show their link once they exist.
+        const notice = document.createElement('div');
+        notice.classList.add('message', 'bot-message', 'progress-message');
+        notice.textContent = '📝 Publishing to Notion...';
+        chatMessages.appendChild(notice);
+        scrollToBottom();
+
+        while (true) {
+            await sleep(3000);
+            const response = await fetch(statusUrl);
+            if (!response.ok) { notice.textContent = '⚠️ Lost track of the Notion upload.'; return; }
+            const entry = await response.json();
+            if (entry.status === 'done') {
+                notice.remove();
+                addMessage(`[View "${entry.title}" on Notion](${entry.url})`, 'bot-message');
+                return;
+            }
+            if (entry.status === 'failed') {
+                notice.textContent = `⚠️ Could not publish "${entry.title}" to Notion: ${entry.error}`;
+                return;
+            }
+            if (entry.attempts > 0) notice.textContent = `📝 Publishing to Notion (retry ${entry.attempts})...`;
+        }
+    }
+
     function addMessage(text, className) {
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('message', className);
@@ -162,6 +251,28 @@ document.addEventListener('DOMContentLoaded', () => {
         scrollToBottom();
     }
 
+    function addProgressMessage(text) {
+        // Progress lines sit above the typing indicator so it stays at the bottom.
+        const progressDiv = document.createElement('div');
+        progressDiv.classList.add('message', 'bot-message', 'progress-message');
+        progressDiv.textContent = text;
+        chatMessages.insertBefore(progressDiv, chatMessages.querySelector('.typing-indicator'));
+        scrollToBottom();
+    }
+
+    function addLiveOutput(agent) {
+        const bubble = document.createElement('div');
+        bubble.classList.add('message', 'bot-message', 'live-output');
+        const label = document.createElement('div');
+        label.classList.add('live-output-agent');
+        label.textContent = agent;
+        const text = document.createElement('div');
+        text.classList.add('live-output-text');
+        bubble.append(label, text);
+        chatMessages.insertBefore(bubble, chatMessages.querySelector('.typing-indicator'));
+        return bubble;
+    }
+
     function showTypingIndicator() {
         if (chatMessages.querySelector('.typing-indicator')) return;
         const indicator = document.createElement('div');
@@ -0,0 +1,21 @@
+# tests/conftest.py
+
+# Standard library imports
+import os # Points the app's stores at throwaway files before `src` is imported.
+import tempfile # Holds those files for the test session.
+
+# The process-wide stores are created when their modules are imported, so they are pointed
+# at a scratch directory here, and LLM and Composio calls are answered by the local stubs.
+_DATA_DIR = tempfile.mkdtemp(prefix="buddy-tests-")
+for _name, _file in [("CHECKPOINT_DB", "checkpoints.sqlite3"), ("PRICE_INDEX_DB", "price_index.sqlite3"),
+                     ("NOTION_OUTBOX_DB", "notion_outbox.sqlite3"), ("SESSION_DB", "sessions.sqlite3"),
+                     ("JOB_DB", "jobs.sqlite3"), ("RESULT_CACHE_DB", "result_cache.sqlite3"),
+                     ("COMPOSIO_TOOL_CACHE", "composio_tools_cache.json")]:
+    os.environ.setdefault(_name, os.path.join(_DATA_DIR, _file))
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("COMPOSIO_BACKEND", "stub")
+os.environ.setdefault("CONFIG_RELOAD_INTERVAL", "0")
+os.environ.setdefault("CREWAI_TESTING", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_TRACING_ENABLED", "false")
@@ -0,0 +1,49 @@
+# tests/test_jobs.py
+
+# Standard library imports
+import itertools # Bounds how much of a stream a test reads, so a stream that never ends fails instead of hanging.
+import time # Waits for submitted jobs to finish.
+
+# Local application imports
+from src.jobs import JobManager, JobStore, event_stream # Functions under test.
+
+def finished_job(manager):
+    job = manager.submit('planning', 'owner', lambda: {'response': {}, 'session': {}, 'clear_session': False})
+    deadline = time.monotonic() + 5
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.done
+    return job
+
+def read_stream(job, cursor):
+    return list(itertools.islice(event_stream(job, cursor, keepalive=0.05), 20))
+
+def test_stream_of_finished_job_ends_after_final_event():
+    job = finished_job(JobManager(max_workers=1))
+    chunks = read_stream(job, 0)
+    assert chunks[-1].startswith(f"id: {len(job.events) - 1}\nevent: status")
+    # A reconnect that already has the final event gets no events and no keep-alives.
+    assert read_stream(job, len(job.events)) == ["retry: 3000\n\n"]
+
+def test_stream_of_stored_job_ends_after_final_event(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job = finished_job(JobManager(max_workers=1, store=store))
+    stored = store.load(job.id)
+    chunks = read_stream(stored, 0)
+    assert len(chunks) == len(job.events) + 1
+    assert '"succeeded"' in chunks[-1]
+    assert read_stream(stored, len(job.events)) == ["retry: 3000\n\n"]
+
+def test_final_event_is_emitted_when_the_store_fails(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    manager = JobManager(max_workers=1, store=store)
+    save = store.save
+    def save_unless_done(job):
+        # Only the final write fails, as with a database locked while the job ran.
+        if job.done:
+            raise OSError("database is locked")
+        save(job)
+    store.save = save_unless_done
+    job = finished_job(manager)
+    assert job.status == 'succeeded'
+    assert job.events[-1]['data']['status'] == 'succeeded'
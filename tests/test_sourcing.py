@@ -0,0 +1,57 @@
+# tests/test_sourcing.py
+
+# Standard library imports
+import threading # Stands in for a sourcing run's rate-limit event.
+
+# Local application imports
+import src.sourcing as sourcing # Module under test.
+from src.bom_table import parse_markdown_table, render_markdown_table # Builds and reads the BOM tables.
+from src.checkpoints import CheckpointStore # Fresh checkpoint store per test.
+from src.crew import ProjectPartnerCrew # Real crew manager, so its result cache is exercised.
+from src.price_index import PriceIndex # Fresh price index per test.
+
+CONCEPTUAL_BOM = render_markdown_table(['Sl no.', 'Component Name', 'Quantity', 'Purpose'], [
+    {'Component Name': name, 'Quantity': '1', 'Purpose': f"Purpose of {name}."}
+    for name in ("Arduino Uno R3", "DHT22 Sensor", "5V Relay Module", "Mini Submersible Pump")
+])
+
+def priced(name, price):
+    return {'Component Name': name, 'Quantity': '1', 'Price (INR)': price, 'Purchase URL': f"https://shop.example/{price}"}
+
+def test_final_bom_keeps_conceptual_order(tmp_path, monkeypatch):
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    price_index = PriceIndex(str(tmp_path / "price_index.sqlite3"), max_age=3600)
+    # The third part was sourced before a pause and the fourth is in the price index;
+    # the first two still need a search.
+    checkpoints.record_components("session", [priced("5V Relay Module", "90")])
+    price_index.record_rows([priced("Mini Submersible Pump", "120")])
+    monkeypatch.setattr(sourcing, 'CHECKPOINTS', checkpoints)
+    monkeypatch.setattr(sourcing, 'PRICE_INDEX', price_index)
+    monkeypatch.setattr(sourcing, 'source_component', lambda crew_manager, row, rate_limited: priced(row['Component Name'], "450"))
+
+    result = sourcing.source_bom(None, CONCEPTUAL_BOM, "session")
+    rows = parse_markdown_table(result['final_bom_table'])
+    assert [row['Component Name'] for row in rows] == ["Arduino Uno R3", "DHT22 Sensor", "5V Relay Module", "Mini Submersible Pump"]
+    assert [row['Sl no.'] for row in rows] == ["1", "2", "3", "4"]
+
+def test_unpriced_part_is_sourced_again_by_the_next_project(monkeypatch):
+    answers = [
+        '{"name": "HC-SR04 Ultrasonic Sensor", "quantity": 1, "price_inr": "N/A", "purchase_url": "N/A"}',
+        '{"name": "HC-SR04 Ultrasonic Sensor", "quantity": 1, "price_inr": "₹95", "purchase_url": "https://robu.in/hc-sr04"}',
+    ]
+    calls = []
+
+    class FakeCrew:
+        def kickoff(self, inputs):
+            calls.append(inputs)
+            return type('Output', (), {'raw': answers[len(calls) - 1]})()
+
+    monkeypatch.setattr(ProjectPartnerCrew, 'sourcing_crew', lambda self: FakeCrew())
+    first = {'Component Name': 'HC-SR04 Ultrasonic Sensor', 'Quantity': '1', 'Purpose': "Measures the water level."}
+    second = dict(first, Purpose="Detects obstacles in front of the robot.")
+
+    with ProjectPartnerCrew() as crew_manager:
+        assert sourcing.source_component(crew_manager, first, threading.Event())['Price (INR)'] == 'N/A'
+        row = sourcing.source_component(crew_manager, second, threading.Event())
+    assert len(calls) == 2
+    assert (row['Price (INR)'], row['Purchase URL']) == ("95", "https://robu.in/hc-sr04")
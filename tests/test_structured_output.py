@@ -0,0 +1,30 @@
+# tests/test_structured_output.py
+
+# Local application imports
+from src.structured_output import ProjectDiagrams, load_json, parse_output # Functions under test.
+
+def test_fenced_json_with_inner_mermaid_fences():
+    # A ```mermaid fence inside a string value must not end the outer ```json fence.
+    reply = (
+        '```json\n{"workflow_mermaid": "```mermaid\\nflowchart TD\\n    A[Start] --> B[End]\\n```", '
+        '"architecture_mermaid": "```mermaid\\nflowchart LR\\n    MCU[Controller] --> OUT[Relay]\\n```"}\n```'
+    )
+    data = load_json(reply)
+    assert data['workflow_mermaid'].startswith('```mermaid')
+    diagrams = parse_output(reply, ProjectDiagrams)
+    assert diagrams.workflow_mermaid == "flowchart TD\n    A[Start] --> B[End]"
+    assert diagrams.architecture_mermaid == "flowchart LR\n    MCU[Controller] --> OUT[Relay]"
+
+def test_unfenced_and_truncated_json():
+    assert load_json('Here you go: {"a": [1, 2]} done') == {'a': [1, 2]}
+    assert load_json('```json\n{"a": [1, 2, {"b": 3') == {'a': [1, 2, {'b': 3}]}
+
+def test_reask_for_empty_field_includes_the_task():
+    prompts = []
+    def reask(prompt):
+        prompts.append(prompt)
+        return '{"architecture_mermaid": "flowchart LR\\n    A[Sensor] --> B[Pump]"}'
+    reply = '{"workflow_mermaid": "flowchart TD\\n    A --> B", "architecture_mermaid": ""}'
+    diagrams = parse_output(reply, ProjectDiagrams, reask=reask, context="Diagram the plant watering system.")
+    assert diagrams.architecture_mermaid.startswith("flowchart LR")
+    assert "Diagram the plant watering system." in prompts[0]